@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark the binary protocol against the JSON /weather route.
+
+Starts the service with warm caches (restored from a generated snapshot, so
+no upstream calls are made), then looks up the same cities through
+GET /weather/{city_name} and through the Unix socket protocol. Reports
+wall time and server CPU time per lookup. Linux only: server CPU is read
+from /proc.
+
+Usage:
+    python scripts/benchmark_binary_protocol.py --lookups 5000 --batch 50
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.binary_protocol import STATUS_OK, BinaryWeatherClient  # noqa: E402
+from src.cache import InProcessCacheBackend  # noqa: E402
+from src.snapshot import CacheSnapshotter  # noqa: E402
+
+
+def write_snapshot(path, cities):
+    """Write a snapshot with every city geocoded and its weather cached"""
+    geocode, weather = InProcessCacheBackend(), InProcessCacheBackend()
+    for i, city in enumerate(cities):
+        latitude, longitude = -60 + i * 0.001, -170 + i * 0.001
+        geocode.set(city.lower(), [latitude, longitude], 3600)
+        weather.set(f"{latitude:.4f},{longitude:.4f}", {"temperature": 10 + i % 20}, 3600)
+    CacheSnapshotter(path, {"geocode": geocode, "weather": weather}).save()
+
+
+def server_cpu_seconds(pid):
+    """User plus system CPU time consumed by a process"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def measure(name, pid, lookups, run):
+    """Time run() and report per-lookup wall and server CPU time"""
+    cpu_before = server_cpu_seconds(pid)
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    cpu = server_cpu_seconds(pid) - cpu_before
+    print(
+        f"{name:<28} {elapsed / lookups * 1e6:10.1f} us wall "
+        f"{cpu / lookups * 1e6:10.1f} us server CPU per lookup"
+    )
+    return cpu / lookups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--cities", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    cities = [f"City{i:05d}" for i in range(args.cities)]
+    workload = [cities[i % len(cities)] for i in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, "cache.snapshot")
+        socket_path = os.path.join(tmp, "weather.sock")
+        write_snapshot(snapshot, cities)
+
+        env = dict(
+            os.environ,
+            WEATHER_CACHE_SNAPSHOT_PATH=snapshot,
+            WEATHER_CACHE_SNAPSHOT_INTERVAL="3600",
+            WEATHER_BINARY_SOCKET=socket_path,
+            LOG_LEVEL="WARNING",
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.main:app",
+             "--port", str(args.port), "--log-level", "warning", "--no-access-log"],
+            cwd=ROOT,
+            env=env,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            for _ in range(100):
+                try:
+                    if requests.get(f"{base_url}/health", timeout=1).ok and os.path.exists(socket_path):
+                        break
+                except requests.ConnectionError:
+                    pass
+                time.sleep(0.1)
+            else:
+                raise SystemExit("Server did not start")
+
+            session = requests.Session()
+
+            def run_json():
+                for city in workload:
+                    response = session.get(f"{base_url}/weather/{city}")
+                    assert response.status_code == 200, response.text
+
+            def run_binary(batch_size):
+                def run():
+                    client = BinaryWeatherClient(socket_path)
+                    try:
+                        batches = [
+                            workload[i:i + batch_size]
+                            for i in range(0, len(workload), batch_size)
+                        ]
+                        for i in range(0, len(batches), 16):
+                            for results in client.pipeline(batches[i:i + 16]):
+                                assert all(status == STATUS_OK for status, _ in results)
+                    finally:
+                        client.close()
+                return run
+
+            print(f"{args.lookups} lookups over {args.cities} cached cities\n")
+            json_cpu = measure("JSON over HTTP", server.pid, args.lookups, run_json)
+            single_cpu = measure("binary, 1 city per frame", server.pid, args.lookups, run_binary(1))
+            batch_cpu = measure(
+                f"binary, {args.batch} cities per frame", server.pid, args.lookups,
+                run_binary(args.batch),
+            )
+            print()
+            print(f"Server CPU saved per lookup: {(json_cpu - single_cpu) * 1e6:.1f} us unbatched, "
+                  f"{(json_cpu - batch_cpu) * 1e6:.1f} us batched")
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
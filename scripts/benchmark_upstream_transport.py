@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark the nginx-to-uvicorn hop over TCP and Unix domain sockets.
+
+nginx used to open a new TCP connection to uvicorn for every request. This
+script makes requests to uvicorn the way nginx does: one new connection per
+request, or reused HTTP/1.1 keep-alive connections. It runs each pattern over
+TCP on 127.0.0.1 and over a Unix domain socket, against two servers with warm
+caches (restored from a generated snapshot, so no upstream calls are made).
+It reports wall time and server CPU time per request. Linux only: server CPU
+is read from /proc.
+
+Run it from a repository checkout on the deployment host to measure the
+hop there.
+
+Usage:
+    python scripts/benchmark_upstream_transport.py --requests 5000
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# Shared helpers live in the sibling benchmark script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from benchmark_binary_protocol import ROOT, measure, write_snapshot  # noqa: E402
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket, as nginx's unix: upstreams"""
+
+    def __init__(self, path: str):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def start_server(args, env):
+    """Start uvicorn with the given bind arguments"""
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", *args,
+         "--log-level", "warning", "--no-access-log", "--timeout-keep-alive", "75"],
+        cwd=ROOT,
+        env=env,
+    )
+
+
+def wait_until_ready(connect):
+    """Poll /health until the server answers"""
+    for _ in range(100):
+        try:
+            connection = connect()
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                connection.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise SystemExit("Server did not start")
+
+
+def requests_runner(connect, paths, keepalive):
+    """Issue a GET for each path, reusing one connection if keepalive is set"""
+    def run():
+        connection = connect() if keepalive else None
+        for path in paths:
+            if keepalive:
+                connection.request("GET", path)
+            else:
+                connection = connect()
+                connection.request("GET", path, headers={"Connection": "close"})
+            response = connection.getresponse()
+            response.read()
+            assert response.status == 200, response.status
+            if not keepalive:
+                connection.close()
+        if keepalive:
+            connection.close()
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--cities", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    cities = [f"City{i:05d}" for i in range(args.cities)]
+    paths = [f"/weather/{cities[i % len(cities)]}" for i in range(args.requests)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, "cache.snapshot")
+        socket_path = os.path.join(tmp, "app.sock")
+        write_snapshot(snapshot, cities)
+
+        env = dict(
+            os.environ,
+            WEATHER_CACHE_SNAPSHOT_PATH=snapshot,
+            WEATHER_CACHE_SNAPSHOT_INTERVAL="3600",
+            WEATHER_PREFETCH_BUDGET="0",
+            LOG_LEVEL="WARNING",
+        )
+        tcp_server = start_server(["--host", "127.0.0.1", "--port", str(args.port)], env)
+        uds_server = start_server(["--uds", socket_path], env)
+        try:
+            def connect_tcp():
+                return http.client.HTTPConnection("127.0.0.1", args.port)
+
+            def connect_uds():
+                return UnixHTTPConnection(socket_path)
+
+            wait_until_ready(connect_tcp)
+            wait_until_ready(connect_uds)
+
+            print(f"{args.requests} requests over {args.cities} cached cities\n")
+            results = {}
+            for name, server, connect in (
+                ("TCP", tcp_server, connect_tcp),
+                ("UDS", uds_server, connect_uds),
+            ):
+                for keepalive in (False, True):
+                    label = f"{name}, {'keep-alive' if keepalive else 'new connection'}"
+                    # Warm up so both patterns see the same server state
+                    requests_runner(connect, paths[:200], keepalive)()
+                    results[label] = measure(
+                        label, server.pid, args.requests,
+                        requests_runner(connect, paths, keepalive),
+                    )
+
+            baseline = results["TCP, new connection"]
+            print()
+            for label, cpu in results.items():
+                if label != "TCP, new connection":
+                    print(f"Server CPU saved per request vs TCP, new connection: "
+                          f"{(baseline - cpu) * 1e6:7.1f} us ({label})")
+        finally:
+            for server in (tcp_server, uds_server):
+                server.terminate()
+                server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Admission control for requests that need upstream calls.
+
+The ``AdmissionController`` caps how many upstream-bound requests run at
+once and queues a bounded number of extras. The cap adapts with a latency
+gradient: when recent latency rises above the long-term baseline the limit
+shrinks, and when latency is steady it grows. Requests that cannot be
+admitted in time are rejected with ``Overloaded`` so the route can answer
+503 immediately instead of accepting work it cannot finish.
+
+Admitted work runs on the controller's own threads, one per slot, so
+requests blocked on upstream never occupy the threadpool that serves
+cache hits.
+"""
+import asyncio
+import functools
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Service is saturated, retry later")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Adaptive concurrency limit with a bounded FIFO wait queue"""
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 2,
+        max_limit: int = 32,
+        max_queue: int = 50,
+        queue_timeout: float = 1.0,
+        smoothing: float = 0.2,
+        tolerance: float = 1.5,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self.rejected = 0
+        self.short_rtt = 0.0
+        self.long_rtt = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def queued(self) -> int:
+        """Number of requests waiting for a slot"""
+        return len(self._waiters)
+
+    def saturation(self) -> float:
+        """Fraction of concurrency and queue capacity in use, from 0.0 to 1.0"""
+        capacity = int(self.limit) + self.max_queue
+        return min(1.0, (self.in_flight + self.queued) / capacity)
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait, based on current latency"""
+        drain_time = self.short_rtt * (self.queued + 1) / max(self.limit, 1.0)
+        return max(1, math.ceil(drain_time))
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold a concurrency slot for the duration of the block"""
+        await self._acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._update_limit(time.perf_counter() - start)
+            self._release()
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Call func(*args) on a worker thread while holding a concurrency slot"""
+        async with self.admit():
+            if self._executor is None:
+                # The limit never exceeds max_limit, so admitted calls never queue here
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_limit, thread_name_prefix="admitted"
+                )
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def _acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # The slot is handed over by _release, which also counts it in flight
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return
+            self._waiters.remove(waiter)
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+        except asyncio.CancelledError:
+            # Client went away: give back a slot that was already handed over
+            if waiter.done():
+                self._release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _update_limit(self, rtt: float) -> None:
+        """Move the limit along the ratio of long-term to recent latency"""
+        if self.long_rtt == 0.0:
+            self.short_rtt = self.long_rtt = rtt
+            return
+        self.short_rtt += 0.5 * (rtt - self.short_rtt)
+        self.long_rtt += 0.05 * (rtt - self.long_rtt)
+        if self.long_rtt > 2 * self.short_rtt:
+            # Recover the baseline quickly after latency drops back down
+            self.long_rtt *= 0.9
+        if self.short_rtt <= 0.0:
+            return
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        if new_limit > self.limit and self.in_flight < self.limit / 2:
+            # Not using the current limit, so there is no evidence to grow it
+            return
+        new_limit = self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+        self.limit = max(self.min_limit, min(self.max_limit, new_limit))
+
+    def summary(self) -> Dict[str, Any]:
+        """Current limit, usage and saturation level"""
+        return {
+            "saturation": round(self.saturation(), 3),
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
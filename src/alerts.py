@@ -0,0 +1,198 @@
+"""
+Threshold alerts evaluated in one vectorized pass per refresh.
+
+Rules such as "notify when London drops below 0 °C" are stored column-wise in
+NumPy arrays and grouped by location. Each refresh fetches every location
+with active rules once (through the ``WeatherService`` caches), then checks
+all rules against that batch of temperatures with a handful of array
+operations. Rules fire when they cross their threshold and re-arm once the
+temperature moves back, and fired alerts are posted to a webhook.
+"""
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+logger = logging.getLogger(__name__)
+
+DIRECTIONS = {"above": 1.0, "below": -1.0}
+
+
+class AlertRules:
+    """Columnar store of threshold rules, grouped by location"""
+
+    def __init__(self, capacity: int = 1024):
+        self.rule_ids = np.zeros(capacity, dtype=np.int64)
+        self.location_index = np.zeros(capacity, dtype=np.int32)
+        self.threshold = np.zeros(capacity, dtype=np.float64)
+        self.sign = np.zeros(capacity, dtype=np.float64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.breached = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.locations: List[Tuple[float, float]] = []
+        self.location_names: List[str] = []
+        self._location_keys: Dict[Tuple[float, float], int] = {}
+        self._slots: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._next_id = 1
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _grow(self) -> None:
+        capacity = len(self.rule_ids) * 2
+        for name in ("rule_ids", "location_index", "threshold", "sign", "active", "breached"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _location(self, city_name: str, latitude: float, longitude: float) -> int:
+        key = (round(latitude, 4), round(longitude, 4))
+        index = self._location_keys.get(key)
+        if index is None:
+            index = len(self.locations)
+            self._location_keys[key] = index
+            self.locations.append(key)
+            self.location_names.append(city_name)
+        return index
+
+    def add(
+        self, city_name: str, latitude: float, longitude: float, threshold: float, direction: str
+    ) -> int:
+        """Register a rule and return its id"""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Direction must be one of {', '.join(DIRECTIONS)}")
+        with self.lock:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                if self.size == len(self.rule_ids):
+                    self._grow()
+                slot = self.size
+                self.size += 1
+            rule_id = self._next_id
+            self._next_id += 1
+            self.rule_ids[slot] = rule_id
+            self.location_index[slot] = self._location(city_name, latitude, longitude)
+            self.threshold[slot] = threshold
+            self.sign[slot] = DIRECTIONS[direction]
+            self.active[slot] = True
+            self.breached[slot] = False
+            self._slots[rule_id] = slot
+            return rule_id
+
+    def remove(self, rule_id: int) -> bool:
+        """Deactivate a rule; return False if it does not exist"""
+        with self.lock:
+            slot = self._slots.pop(rule_id, None)
+            if slot is None:
+                return False
+            self.active[slot] = False
+            self._free.append(slot)
+            return True
+
+    def active_locations(self) -> List[int]:
+        """Indexes of locations that have at least one active rule"""
+        with self.lock:
+            n = self.size
+            return np.unique(self.location_index[:n][self.active[:n]]).tolist()
+
+    def evaluate(self, temperatures: np.ndarray) -> np.ndarray:
+        """Return slots of rules that newly crossed their threshold
+
+        temperatures holds one value per location, NaN where unknown; rules
+        at unknown locations keep their previous state.
+        """
+        with self.lock:
+            n = self.size
+            missing = len(self.locations) - len(temperatures)
+            if missing > 0:
+                # Locations registered since the temperatures were fetched
+                temperatures = np.concatenate([temperatures, np.full(missing, np.nan)])
+            current = temperatures[self.location_index[:n]]
+            known = ~np.isnan(current)
+            # sign is +1 for "above" and -1 for "below", so one comparison covers both
+            breached = self.sign[:n] * (current - self.threshold[:n]) > 0
+            breached &= self.active[:n]
+            fired = breached & ~self.breached[:n]
+            self.breached[:n] = np.where(known, breached, self.breached[:n])
+            return np.flatnonzero(fired)
+
+    def describe(self, slot: int, temperature: float) -> Dict[str, Any]:
+        """Alert payload for a fired rule"""
+        location = int(self.location_index[slot])
+        return {
+            "rule_id": int(self.rule_ids[slot]),
+            "city": self.location_names[location],
+            "direction": "above" if self.sign[slot] > 0 else "below",
+            "threshold": float(self.threshold[slot]),
+            "temperature": float(temperature),
+        }
+
+
+class WebhookSink:
+    """Deliver fired alerts as a JSON batch to a webhook URL"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, alerts: List[Dict[str, Any]]) -> None:
+        try:
+            response = requests.post(self.url, json={"alerts": alerts}, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error("Failed to deliver %d alerts to %s: %s", len(alerts), self.url, e)
+
+
+class LogSink:
+    """Log fired alerts when no webhook is configured"""
+
+    def deliver(self, alerts: List[Dict[str, Any]]) -> None:
+        for alert in alerts:
+            logger.warning("Alert fired: %s", alert)
+
+
+class AlertEngine:
+    """Fetch each watched location once and evaluate all rules against it"""
+
+    def __init__(self, service: Any, sink: Any, rules: Optional[AlertRules] = None):
+        self.service = service
+        self.sink = sink
+        self.rules = rules or AlertRules()
+
+    def fetch_temperatures(self) -> np.ndarray:
+        """Current temperature per location, NaN where it could not be fetched
+
+        Locations missing from the weather cache are fetched one at a time
+        and bypass admission control, so a refresh over many cold locations
+        spends upstream calls that are not shed under load.
+        """
+        temperatures = np.full(len(self.rules.locations), np.nan)
+        for index in self.rules.active_locations():
+            latitude, longitude = self.rules.locations[index]
+            try:
+                conditions = self.service.get_current_conditions(latitude, longitude)
+            except ValueError as e:
+                logger.warning("Skipping alerts for %s: %s", self.rules.location_names[index], e)
+                continue
+            temperatures[index] = conditions["temperature"]
+        return temperatures
+
+    def refresh(self) -> List[Dict[str, Any]]:
+        """Run one refresh cycle and deliver any alerts that fired"""
+        if not len(self.rules):
+            return []
+        temperatures = self.fetch_temperatures()
+        fired = self.rules.evaluate(temperatures)
+        alerts = [
+            self.rules.describe(slot, temperatures[self.rules.location_index[slot]])
+            for slot in fired
+        ]
+        if alerts:
+            self.sink.deliver(alerts)
+        return alerts
@@ -0,0 +1,194 @@
+"""
+Compact length-prefixed protocol over a Unix socket for internal callers.
+
+Each request frame asks for the current temperature of one or more cities;
+clients may pipeline frames without waiting, and responses come back in
+order. Lookups share the ``WeatherService`` caches and admission control
+with the HTTP API.
+
+Frames (all integers little-endian)::
+
+    request   = payload length u32 | city count u16 | (name length u8 | UTF-8 name)*
+    response  = payload length u32 | city count u16 | (status u8 | pad 3 | celsius f32)*
+
+Every city in a response takes a fixed 8 bytes, in request order. The
+temperature is NaN unless the status is ``STATUS_OK``.
+"""
+import asyncio
+import logging
+import os
+import socket
+import struct
+from typing import Any, List, Optional, Sequence, Tuple
+
+try:
+    from .admission import Overloaded
+except ImportError:  # running as a top-level module, e.g. uvicorn main:app
+    from admission import Overloaded
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = 0
+STATUS_NOT_FOUND = 1
+STATUS_OVERLOADED = 2
+STATUS_ERROR = 3
+
+MAX_CITIES = 1024
+MAX_FRAME = 4 + 2 + MAX_CITIES * 256
+
+_LENGTH = struct.Struct("<I")
+_COUNT = struct.Struct("<H")
+_RESULT = struct.Struct("<B3xf")
+
+Result = Tuple[int, float]
+
+
+class ProtocolError(Exception):
+    """Raised for malformed or oversized frames"""
+
+
+def encode_request(city_names: Sequence[str]) -> bytes:
+    """Build a request frame for a batch of cities"""
+    if len(city_names) > MAX_CITIES:
+        raise ProtocolError(f"At most {MAX_CITIES} cities per frame")
+    parts = [_COUNT.pack(len(city_names))]
+    for name in city_names:
+        encoded = name.encode("utf-8")
+        if len(encoded) > 255:
+            raise ProtocolError("City names are limited to 255 bytes")
+        parts.append(bytes((len(encoded),)) + encoded)
+    payload = b"".join(parts)
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def decode_request(payload: bytes) -> List[str]:
+    """Parse a request payload into city names"""
+    try:
+        (count,) = _COUNT.unpack_from(payload)
+        if count > MAX_CITIES:
+            raise ProtocolError(f"At most {MAX_CITIES} cities per frame")
+        names = []
+        offset = _COUNT.size
+        for _ in range(count):
+            length = payload[offset]
+            names.append(payload[offset + 1:offset + 1 + length].decode("utf-8"))
+            offset += 1 + length
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise ProtocolError(f"Malformed request frame: {e}")
+    if offset != len(payload):
+        raise ProtocolError("Trailing bytes in request frame")
+    return names
+
+
+def encode_response(results: Sequence[Result]) -> bytes:
+    """Build a response frame with one fixed-size record per city"""
+    payload = _COUNT.pack(len(results)) + b"".join(
+        _RESULT.pack(status, temperature) for status, temperature in results
+    )
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def decode_response(payload: bytes) -> List[Result]:
+    """Parse a response payload into (status, temperature) pairs"""
+    (count,) = _COUNT.unpack_from(payload)
+    return [
+        _RESULT.unpack_from(payload, _COUNT.size + i * _RESULT.size) for i in range(count)
+    ]
+
+
+class BinaryProtocolServer:
+    """Serve the binary protocol from a WeatherService on a Unix socket"""
+
+    def __init__(self, service: Any, admission: Any):
+        self.service = service
+        self.admission = admission
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, path: str) -> None:
+        """Listen on the Unix socket at path, replacing a stale socket file"""
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = await asyncio.start_unix_server(self._handle, path)
+        logger.info("Binary protocol listening on %s", path)
+
+    async def close(self) -> None:
+        """Stop accepting connections"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(_LENGTH.size)
+                except asyncio.IncompleteReadError:
+                    return
+                (length,) = _LENGTH.unpack(header)
+                if length > MAX_FRAME:
+                    raise ProtocolError(f"Frame of {length} bytes exceeds {MAX_FRAME}")
+                names = decode_request(await reader.readexactly(length))
+                writer.write(encode_response(await self.lookup_many(names)))
+                await writer.drain()
+        except (ProtocolError, asyncio.IncompleteReadError) as e:
+            logger.warning("Closing binary protocol connection: %s", e)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def lookup_many(self, city_names: Sequence[str]) -> List[Result]:
+        """Resolve a batch, answering cache hits with one pipelined multi-get"""
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(
+            None, self.service.get_cached_temperatures, city_names
+        )
+        misses = sorted({name for name in city_names if name not in cached})
+        fetched = await asyncio.gather(*(self._lookup_one(name) for name in misses))
+        results = dict(zip(misses, fetched))
+        results.update((name, (STATUS_OK, temperature)) for name, temperature in cached.items())
+        return [results[name] for name in city_names]
+
+    async def _lookup_one(self, city_name: str) -> Result:
+        try:
+            conditions = await self.admission.run(self.service.get_city_conditions, city_name)
+            return STATUS_OK, conditions["temperature"]
+        except Overloaded:
+            return STATUS_OVERLOADED, float("nan")
+        except ValueError:
+            return STATUS_NOT_FOUND, float("nan")
+        except Exception as e:
+            logger.error("Binary lookup failed for %s: %s", city_name, e)
+            return STATUS_ERROR, float("nan")
+
+
+class BinaryWeatherClient:
+    """Blocking client for the binary protocol"""
+
+    def __init__(self, path: str, timeout: float = 10.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self._reader = self.sock.makefile("rb")
+
+    def close(self) -> None:
+        """Close the connection"""
+        self._reader.close()
+        self.sock.close()
+
+    def _read_frame(self) -> List[Result]:
+        header = self._reader.read(_LENGTH.size)
+        if len(header) < _LENGTH.size:
+            raise ConnectionError("Connection closed by server")
+        (length,) = _LENGTH.unpack(header)
+        return decode_response(self._reader.read(length))
+
+    def pipeline(self, batches: Sequence[Sequence[str]]) -> List[List[Result]]:
+        """Send several request frames in one write and read their responses"""
+        self.sock.sendall(b"".join(encode_request(batch) for batch in batches))
+        return [self._read_frame() for _ in batches]
+
+    def get_temperatures(self, city_names: Sequence[str]) -> List[Result]:
+        """Look up one batch of cities"""
+        return self.pipeline([city_names])[0]
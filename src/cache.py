@@ -0,0 +1,525 @@
+"""
+Cache backends for the weather service.
+
+Two implementations sit behind the ``CacheBackend`` interface:
+
+* ``InProcessCacheBackend`` - a per-process dictionary with TTLs.
+* ``RedisCacheBackend`` - a shared L2 spread over one or more Redis-protocol
+  nodes with consistent hashing, fronted by a short-lived in-process L1.
+
+``get_or_load`` takes a fill lock before calling the loader, so with a shared
+backend only one replica in the fleet goes upstream for a given key per TTL.
+"""
+import bisect
+import hashlib
+import json
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from .store import TinyLFUStore
+except ImportError:  # running as a top-level module, e.g. uvicorn main:app
+    from store import TinyLFUStore
+
+logger = logging.getLogger(__name__)
+
+# Delete a lock only if it still holds our token, so a holder whose lock has
+# expired cannot release the lock another replica has since taken
+_UNLOCK_SCRIPT = (
+    'if redis.call("GET", KEYS[1]) == ARGV[1] then '
+    'return redis.call("DEL", KEYS[1]) else return 0 end'
+)
+
+
+class CacheBackend:
+    """Interface shared by all cache backends"""
+
+    lock_timeout = 10.0
+    lock_poll_interval = 0.05
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        raise NotImplementedError
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Like get, but not counted in hit rates or popularity
+
+        For existence checks and re-checks that would otherwise count one
+        request several times.
+        """
+        return self.get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return a mapping of key to value for every key that is cached"""
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store value under key for ttl seconds"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Remove key from the cache"""
+        raise NotImplementedError
+
+    def ttl(self, key: str) -> Optional[float]:
+        """Seconds until key expires, or None if it is missing or expired"""
+        raise NotImplementedError
+
+    def try_lock(self, key: str, ttl: float) -> bool:
+        """Try to take the fill lock for key for this thread; return True if acquired"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """Memory use and eviction counters for this process's share of the cache"""
+        return {}
+
+    def entries(self) -> List[Tuple[str, float, Any]]:
+        """Return (key, expires_at, value) for live entries held by this process
+
+        Backends whose data lives outside the process return nothing.
+        """
+        return []
+
+    def restore(self, key: str, value: Any, expires_at: float) -> None:
+        """Reinsert an entry with its original absolute expiry"""
+        ttl = expires_at - time.time()
+        if ttl > 0:
+            self.set(key, value, ttl)
+
+    def unlock(self, key: str) -> None:
+        """Release the fill lock for key if this thread still holds it"""
+        raise NotImplementedError
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: float) -> Any:
+        """Return the cached value for key, calling loader at most once per TTL"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        deadline = time.time() + self.lock_timeout
+        while not self.try_lock(key, self.lock_timeout):
+            # Another worker is filling this key; wait for its result
+            time.sleep(self.lock_poll_interval)
+            value = self.peek(key)
+            if value is not None:
+                return value
+            if time.time() >= deadline:
+                logger.warning("Timed out waiting for cache fill of %s", key)
+                return loader()
+
+        try:
+            value = self.peek(key)
+            if value is None:
+                value = loader()
+                self.set(key, value, ttl)
+            return value
+        finally:
+            self.unlock(key)
+
+
+class InProcessCacheBackend(CacheBackend):
+    """Thread-safe in-process cache with per-entry expiry and a byte budget"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self._store = TinyLFUStore(max_bytes)
+        # key -> (expiry, owning thread)
+        self._locks: Dict[str, Tuple[float, int]] = {}
+        self._mutex = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._mutex:
+            return self._store.get(key, time.time())
+
+    def peek(self, key: str) -> Optional[Any]:
+        with self._mutex:
+            return self._store.peek(key, time.time())
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._mutex:
+            self._store.put(key, value, time.time() + ttl)
+
+    def delete(self, key: str) -> None:
+        with self._mutex:
+            self._store.delete(key)
+
+    def ttl(self, key: str) -> Optional[float]:
+        with self._mutex:
+            expires_at = self._store.expires_at(key)
+        if expires_at is None:
+            return None
+        remaining = expires_at - time.time()
+        return remaining if remaining > 0 else None
+
+    def entries(self) -> List[Tuple[str, float, Any]]:
+        now = time.time()
+        with self._mutex:
+            return [entry for entry in self._store.items() if entry[1] > now]
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        with self._mutex:
+            self._store.clear()
+
+    def try_lock(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        with self._mutex:
+            if self._locks.get(key, (0.0, 0))[0] > now:
+                return False
+            self._locks[key] = (now + ttl, threading.get_ident())
+            return True
+
+    def unlock(self, key: str) -> None:
+        with self._mutex:
+            lock = self._locks.get(key)
+            # A lock that expired may since have been taken by another thread
+            if lock is not None and lock[1] == threading.get_ident():
+                del self._locks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._mutex:
+            return self._store.stats()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+
+class RespError(Exception):
+    """Error reply returned by a Redis-protocol server"""
+
+
+class RespConnection:
+    """Minimal blocking client for the Redis serialization protocol (RESP2)"""
+
+    def __init__(self, host: str, port: int, timeout: float = 1.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader: Any = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        if self._sock is None:
+            self._sock = socket.create_connection((self.host, self.port), self.timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._reader = self._sock.makefile("rb")
+
+    def close(self) -> None:
+        """Close the underlying socket"""
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            finally:
+                self._sock = None
+                self._reader = None
+
+    @staticmethod
+    def encode(*args: Any) -> bytes:
+        """Encode a command as a RESP array of bulk strings"""
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def read_reply(self) -> Any:
+        """Read and decode a single reply"""
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode("utf-8")
+        if prefix == b"-":
+            return RespError(payload.decode("utf-8"))
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if prefix == b"*":
+            count = int(payload)
+            if count == -1:
+                return None
+            return [self.read_reply() for _ in range(count)]
+        raise RespError(f"Unexpected reply prefix {prefix!r}")
+
+    def pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        """Send all commands in one write and read their replies in order"""
+        if not commands:
+            return []
+        with self._lock:
+            try:
+                self._connect()
+                self._sock.sendall(b"".join(self.encode(*c) for c in commands))
+                return [self.read_reply() for _ in commands]
+            except OSError:
+                self.close()
+                raise
+
+    def execute(self, *args: Any) -> Any:
+        """Send a single command and return its reply"""
+        reply = self.pipeline([args])[0]
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to nodes via virtual replicas"""
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 100):
+        self.replicas = replicas
+        self._ring: List[Tuple[int, str]] = []
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    def add_node(self, node: str) -> None:
+        """Add node with its virtual replicas to the ring"""
+        for i in range(self.replicas):
+            bisect.insort(self._ring, (self._hash(f"{node}#{i}"), node))
+
+    def remove_node(self, node: str) -> None:
+        """Remove node and its virtual replicas from the ring"""
+        self._ring = [point for point in self._ring if point[1] != node]
+
+    def get_node(self, key: str) -> str:
+        """Return the node responsible for key"""
+        if not self._ring:
+            raise ValueError("Hash ring has no nodes")
+        index = bisect.bisect(self._ring, (self._hash(key), ""))
+        return self._ring[index % len(self._ring)][1]
+
+
+class RedisCacheBackend(CacheBackend):
+    """Shared L2 cache over Redis-protocol nodes with an in-process L1"""
+
+    listener_min_backoff = 0.5
+    listener_max_backoff = 30.0
+
+    def __init__(
+        self,
+        nodes: Sequence[str],
+        namespace: str = "weather",
+        l1_ttl: float = 5.0,
+        timeout: float = 1.0,
+    ):
+        if not nodes:
+            raise ValueError("At least one cache node is required")
+        self.namespace = namespace
+        self.l1_ttl = l1_ttl
+        self.l1 = InProcessCacheBackend()
+        self.ring = HashRing(nodes)
+        self.invalidation_channel = f"{namespace}:invalidate"
+        self._connections: Dict[str, RespConnection] = {}
+        for node in nodes:
+            host, _, port = node.rpartition(":")
+            self._connections[node] = RespConnection(host, int(port), timeout)
+        self._listeners: List[threading.Thread] = []
+        # (key, owning thread) -> token, so threads sharing a replica never
+        # release each other's locks
+        self._lock_tokens: Dict[Tuple[str, int], str] = {}
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _connection_for(self, key: str) -> RespConnection:
+        return self._connections[self.ring.get_node(key)]
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+        return self._get_shared(key)
+
+    def peek(self, key: str) -> Optional[Any]:
+        value = self.l1.peek(key)
+        if value is not None:
+            return value
+        return self._get_shared(key)
+
+    def _get_shared(self, key: str) -> Optional[Any]:
+        try:
+            raw = self._connection_for(key).execute("GET", self._key(key))
+        except (OSError, RespError) as e:
+            logger.warning("Shared cache GET failed for %s: %s", key, e)
+            return None
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        self.l1.set(key, value, self.l1_ttl)
+        return value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        misses_by_node: Dict[str, List[str]] = {}
+        for key in keys:
+            value = self.l1.get(key)
+            if value is not None:
+                values[key] = value
+            else:
+                misses_by_node.setdefault(self.ring.get_node(key), []).append(key)
+
+        for node, node_keys in misses_by_node.items():
+            commands = [("GET", self._key(key)) for key in node_keys]
+            try:
+                replies = self._connections[node].pipeline(commands)
+            except OSError as e:
+                logger.warning("Shared cache pipeline failed on %s: %s", node, e)
+                continue
+            for key, raw in zip(node_keys, replies):
+                if raw is None or isinstance(raw, RespError):
+                    continue
+                value = json.loads(raw)
+                self.l1.set(key, value, self.l1_ttl)
+                values[key] = value
+        return values
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self.l1.set(key, value, min(ttl, self.l1_ttl))
+        try:
+            existed, reply = self._connection_for(key).pipeline([
+                ("EXISTS", self._key(key)),
+                ("SET", self._key(key), json.dumps(value), "PX", int(ttl * 1000)),
+            ])
+            if isinstance(reply, RespError):
+                raise reply
+            if existed == 1:
+                # Replacing a value other replicas may hold in their L1
+                self.publish_invalidation(key)
+        except (OSError, RespError) as e:
+            logger.warning("Shared cache SET failed for %s: %s", key, e)
+
+    def delete(self, key: str) -> None:
+        self.l1.delete(key)
+        try:
+            self._connection_for(key).execute("DEL", self._key(key))
+            self.publish_invalidation(key)
+        except (OSError, RespError) as e:
+            logger.warning("Shared cache DEL failed for %s: %s", key, e)
+
+    def ttl(self, key: str) -> Optional[float]:
+        try:
+            remaining = self._connection_for(key).execute("PTTL", self._key(key))
+        except (OSError, RespError) as e:
+            logger.warning("Shared cache PTTL failed for %s: %s", key, e)
+            return None
+        if remaining == -1:
+            return float("inf")
+        return remaining / 1000 if remaining > 0 else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"l1": self.l1.stats(), "nodes": sorted(self._connections)}
+
+    def publish_invalidation(self, key: str) -> None:
+        """Tell every replica to drop key from its L1
+
+        Replicas subscribe on every node, so publishing on the key's own node
+        reaches all of them.
+        """
+        self._connection_for(key).execute("PUBLISH", self.invalidation_channel, key)
+
+    def try_lock(self, key: str, ttl: float) -> bool:
+        token = secrets.token_hex(16)
+        try:
+            reply = self._connection_for(key).execute(
+                "SET", self._key(f"lock:{key}"), token, "NX", "PX", int(ttl * 1000)
+            )
+        except (OSError, RespError) as e:
+            # Without the shared store, fall back to filling locally
+            logger.warning("Shared cache lock failed for %s: %s", key, e)
+            return True
+        if reply != "OK":
+            return False
+        self._lock_tokens[(key, threading.get_ident())] = token
+        return True
+
+    def unlock(self, key: str) -> None:
+        token = self._lock_tokens.pop((key, threading.get_ident()), None)
+        if token is None:
+            return
+        try:
+            self._connection_for(key).execute(
+                "EVAL", _UNLOCK_SCRIPT, 1, self._key(f"lock:{key}"), token
+            )
+        except (OSError, RespError) as e:
+            logger.warning("Shared cache unlock failed for %s: %s", key, e)
+
+    def start_invalidation_listener(self) -> None:
+        """Subscribe to invalidations on every node and evict matching L1 entries"""
+        for connection in self._connections.values():
+            thread = threading.Thread(
+                target=self._listen, args=(connection.host, connection.port), daemon=True
+            )
+            thread.start()
+            self._listeners.append(thread)
+
+    def _listen(self, host: str, port: int) -> None:
+        """Apply invalidations from one node, reconnecting with backoff"""
+        backoff = self.listener_min_backoff
+        while True:
+            connection = RespConnection(host, port, None)
+            try:
+                connection._connect()
+                connection._sock.sendall(
+                    RespConnection.encode("SUBSCRIBE", self.invalidation_channel)
+                )
+                connection.read_reply()
+                # Invalidations published while disconnected were missed
+                self.l1.clear()
+                backoff = self.listener_min_backoff
+                while True:
+                    message = connection.read_reply()
+                    if isinstance(message, list) and message[:1] == [b"message"]:
+                        self.l1.delete(message[2].decode("utf-8"))
+            except (OSError, ConnectionError) as e:
+                logger.warning(
+                    "Cache invalidation listener for %s:%s lost, retrying in %.1fs: %s",
+                    host, port, backoff, e,
+                )
+            finally:
+                connection.close()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.listener_max_backoff)
+
+
+def create_cache_backend(namespace: str) -> CacheBackend:
+    """Build the cache backend selected by the WEATHER_CACHE_* environment"""
+    backend = os.environ.get("WEATHER_CACHE_BACKEND", "memory").lower()
+    if backend == "memory":
+        return InProcessCacheBackend(
+            max_bytes=int(os.environ.get("WEATHER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+        )
+    if backend == "redis":
+        nodes = [
+            node.strip()
+            for node in os.environ.get("WEATHER_CACHE_NODES", "127.0.0.1:6379").split(",")
+            if node.strip()
+        ]
+        cache = RedisCacheBackend(
+            nodes,
+            namespace=namespace,
+            l1_ttl=float(os.environ.get("WEATHER_CACHE_L1_TTL", "5")),
+        )
+        cache.start_invalidation_listener()
+        return cache
+    raise ValueError(f"Unknown cache backend '{backend}'")
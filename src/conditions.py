@@ -0,0 +1,70 @@
+"""
+Current-conditions records and in-process projections over them.
+
+Each location's current conditions are fetched once and cached in canonical
+units (Celsius, km/h). Unit conversion and field selection are pure
+functions over that record, so any combination a client asks for costs no
+extra upstream traffic.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Fields kept from the provider's current-conditions record
+FIELDS = ("temperature", "windspeed", "winddirection", "weathercode", "is_day", "time")
+
+UNIT_SYSTEMS: Dict[str, Dict[str, str]] = {
+    "metric": {"temperature": "celsius", "windspeed": "km/h"},
+    "imperial": {"temperature": "fahrenheit", "windspeed": "mph"},
+}
+
+_CONVERSIONS: Dict[str, Dict[str, Callable[[float], float]]] = {
+    "metric": {},
+    "imperial": {
+        "temperature": lambda celsius: celsius * 9 / 5 + 32,
+        "windspeed": lambda kmh: kmh / 1.609344,
+    },
+}
+
+
+def canonical_record(current_weather: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep the known fields of a provider record, in canonical units"""
+    return {field: current_weather[field] for field in FIELDS if field in current_weather}
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Parse a comma-separated field list, defaulting to every field"""
+    if not fields:
+        return list(FIELDS)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown field(s) {', '.join(unknown)}; choose from {', '.join(FIELDS)}"
+        )
+    return selected
+
+
+def parse_units(units: Optional[str]) -> str:
+    """Validate a unit system name, defaulting to metric"""
+    units = (units or "metric").lower()
+    if units not in UNIT_SYSTEMS:
+        raise ValueError(f"Unknown units '{units}'; choose from {', '.join(UNIT_SYSTEMS)}")
+    return units
+
+
+def project(record: Dict[str, Any], fields: Iterable[str], units: str = "metric") -> Dict[str, Any]:
+    """Select fields from a canonical record and convert them to a unit system"""
+    units = parse_units(units)
+    conversions = _CONVERSIONS[units]
+    projected = {}
+    for field in fields:
+        value = record.get(field)
+        if value is not None and field in conversions:
+            value = round(conversions[field](value), 1)
+        projected[field] = value
+    return projected
+
+
+def unit_labels(fields: Iterable[str], units: str) -> Dict[str, str]:
+    """Unit names for the selected fields that carry units"""
+    labels = UNIT_SYSTEMS[units]
+    return {field: labels[field] for field in fields if field in labels}
@@ -0,0 +1,293 @@
+"""
+Append-only local history of observed temperatures.
+
+Every temperature fetched from upstream is appended to a columnar store on
+local disk, partitioned by location and UTC day::
+
+    <root>/<latitude>,<longitude>/<YYYY-MM-DD>/time.f8         float64 epoch seconds
+    <root>/<latitude>,<longitude>/<YYYY-MM-DD>/temperature.f4  float32 Celsius
+
+Appends go to the end of both column files under an exclusive ``flock`` on
+the partition's lock file, so several worker processes can share one store.
+Queries memory-map the column files and binary search the time column, so
+only the pages covering the requested range are read. ``compact`` sorts
+closed partitions, drops those past the retention period and deletes the
+oldest days when the store grows beyond its byte budget.
+"""
+import asyncio
+import datetime
+import fcntl
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TIME_COLUMN = "time.f8"
+TEMPERATURE_COLUMN = "temperature.f4"
+LOCK_FILE = ".lock"
+_DAY_FORMAT = "%Y-%m-%d"
+_SECONDS_PER_DAY = 86400
+# Longest range a history query may cover
+MAX_QUERY_SPAN = 366 * _SECONDS_PER_DAY
+# 9999-12-31T23:59:59Z, the last second datetime can represent
+_MAX_TIMESTAMP = 253402300799.0
+
+
+def _day(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime(_DAY_FORMAT)
+
+
+class _PartitionLock:
+    """Exclusive flock on a partition, held across processes"""
+
+    def __init__(self, partition: str):
+        self.path = os.path.join(partition, LOCK_FILE)
+
+    def __enter__(self) -> None:
+        self.file = open(self.path, "a")
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info: Any) -> None:
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _map(path: str, dtype: Any) -> np.ndarray:
+    """Read-only memory map of a column file; empty if missing"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    count = size // np.dtype(dtype).itemsize
+    if not count:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class HistoryStore:
+    """Columnar, memory-mapped observation history"""
+
+    def __init__(
+        self,
+        root: str,
+        retention_days: int = 30,
+        max_bytes: int = 256 * 1024 * 1024,
+        compact_interval: float = 3600.0,
+    ):
+        self.root = root
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.compact_interval = compact_interval
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def location_key(latitude: float, longitude: float) -> str:
+        """Directory name for a location, rounded like the weather cache keys"""
+        return f"{latitude:.4f},{longitude:.4f}"
+
+    def _partition(self, latitude: float, longitude: float, day: str) -> str:
+        return os.path.join(self.root, self.location_key(latitude, longitude), day)
+
+    def append(self, latitude: float, longitude: float, timestamp: float, temperature: float) -> None:
+        """Record one observation"""
+        partition = self._partition(latitude, longitude, _day(timestamp))
+        os.makedirs(partition, exist_ok=True)
+        time_path = os.path.join(partition, TIME_COLUMN)
+        temperature_path = os.path.join(partition, TEMPERATURE_COLUMN)
+        with _PartitionLock(partition):
+            with open(temperature_path, "ab") as temperatures, open(time_path, "ab") as times:
+                # Drop the tail of an earlier torn append so rows stay aligned
+                time_size = np.dtype(np.float64).itemsize
+                temperature_size = np.dtype(np.float32).itemsize
+                rows = min(
+                    os.fstat(times.fileno()).st_size // time_size,
+                    os.fstat(temperatures.fileno()).st_size // temperature_size,
+                )
+                times.truncate(rows * time_size)
+                temperatures.truncate(rows * temperature_size)
+                # Temperature first: readers trust the shorter of the two columns
+                temperatures.write(np.float32(temperature).tobytes())
+                temperatures.flush()
+                times.write(np.float64(timestamp).tobytes())
+
+    def query(
+        self, latitude: float, longitude: float, start: float, end: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Times and temperatures observed in [start, end]"""
+        times: List[np.ndarray] = []
+        temperatures: List[np.ndarray] = []
+        location = os.path.join(self.root, self.location_key(latitude, longitude))
+        try:
+            days = os.listdir(location)
+        except FileNotFoundError:
+            days = []
+        first, last = _day(start), _day(end)
+        # Day names sort chronologically, so only existing partitions are opened
+        for day in sorted(day for day in days if first <= day <= last):
+            partition = os.path.join(location, day)
+            column = _map(os.path.join(partition, TIME_COLUMN), np.float64)
+            values = _map(os.path.join(partition, TEMPERATURE_COLUMN), np.float32)
+            count = min(len(column), len(values))
+            if count:
+                column = column[:count]
+                lo = int(np.searchsorted(column, start, side="left"))
+                hi = int(np.searchsorted(column, end, side="right"))
+                if hi > lo:
+                    times.append(np.array(column[lo:hi]))
+                    temperatures.append(np.array(values[lo:hi], dtype=np.float64))
+        if not times:
+            return np.empty(0), np.empty(0)
+        return np.concatenate(times), np.concatenate(temperatures)
+
+    def compact(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Sort closed partitions and enforce the retention period and byte budget"""
+        today = _day(time.time() if now is None else now)
+        cutoff = (
+            datetime.datetime.strptime(today, _DAY_FORMAT)
+            - datetime.timedelta(days=self.retention_days)
+        ).strftime(_DAY_FORMAT)
+        sorted_count = removed = 0
+        partitions: List[Tuple[str, str, int]] = []
+        for location in os.listdir(self.root):
+            location_path = os.path.join(self.root, location)
+            if not os.path.isdir(location_path):
+                continue
+            for day in os.listdir(location_path):
+                path = os.path.join(location_path, day)
+                if day < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+                    continue
+                if day < today and self._sort_partition(path):
+                    sorted_count += 1
+                partitions.append((day, path, self._partition_bytes(path)))
+
+        # Oldest days go first when over budget; today's partitions are kept
+        total = sum(size for _, _, size in partitions)
+        for day, path, size in sorted(partitions):
+            if total <= self.max_bytes or day >= today:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+            total -= size
+
+        for location in os.listdir(self.root):
+            location_path = os.path.join(self.root, location)
+            if os.path.isdir(location_path) and not os.listdir(location_path):
+                os.rmdir(location_path)
+        return {"sorted": sorted_count, "removed": removed, "bytes": total}
+
+    @staticmethod
+    def _partition_bytes(path: str) -> int:
+        return sum(
+            os.path.getsize(os.path.join(path, name))
+            for name in (TIME_COLUMN, TEMPERATURE_COLUMN)
+            if os.path.exists(os.path.join(path, name))
+        )
+
+    @staticmethod
+    def _sort_partition(path: str) -> bool:
+        """Rewrite a partition in time order; return True if it was out of order"""
+        time_path = os.path.join(path, TIME_COLUMN)
+        temperature_path = os.path.join(path, TEMPERATURE_COLUMN)
+        if not os.path.exists(time_path):
+            return False
+        with _PartitionLock(path):
+            times = np.fromfile(time_path, dtype=np.float64)
+            temperatures = np.fromfile(temperature_path, dtype=np.float32)
+            count = min(len(times), len(temperatures))
+            if count == len(times) == len(temperatures) and np.all(np.diff(times) >= 0):
+                return False
+            order = np.argsort(times[:count], kind="stable")
+            for column, target in ((temperatures[:count][order], temperature_path),
+                                   (times[:count][order], time_path)):
+                column.tofile(target + ".tmp")
+                os.replace(target + ".tmp", target)
+            return True
+
+    def try_compact(self) -> None:
+        """Compact, logging instead of raising on failure"""
+        try:
+            result = self.compact()
+            logger.info("Compacted observation history: %s", result)
+        except OSError as e:
+            logger.error("Failed to compact observation history: %s", e)
+
+    async def run_periodic(self) -> None:
+        """Compact every interval seconds until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            await loop.run_in_executor(None, self.try_compact)
+
+
+def parse_time(value: Optional[str], default: float) -> float:
+    """Epoch seconds from an ISO 8601 timestamp or epoch number; naive times are UTC"""
+    if value is None:
+        return default
+    try:
+        timestamp = float(value)
+    except ValueError:
+        try:
+            parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError(f"Invalid time '{value}'; use ISO 8601 or epoch seconds")
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        try:
+            timestamp = parsed.timestamp()
+        except (OverflowError, OSError):
+            raise ValueError(f"Time '{value}' is out of range")
+    # NaN fails both comparisons, so it is rejected along with infinities
+    if not 0 <= timestamp <= _MAX_TIMESTAMP:
+        raise ValueError(f"Time '{value}' is out of range")
+    return timestamp
+
+
+def format_time(timestamp: float) -> str:
+    """ISO 8601 UTC representation of epoch seconds"""
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat(
+        timespec="seconds"
+    )
+
+
+def downsample(
+    times: np.ndarray, temperatures: np.ndarray, start: float, bucket: float
+) -> List[Dict[str, Any]]:
+    """Min, max and average temperature per bucket of `bucket` seconds from start"""
+    if not len(times):
+        return []
+    buckets = ((times - start) // bucket).astype(np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    counts = np.diff(np.append(starts, len(times)))
+    minimum = np.minimum.reduceat(temperatures, starts)
+    maximum = np.maximum.reduceat(temperatures, starts)
+    average = np.add.reduceat(temperatures, starts) / counts
+    return [
+        {
+            "start": format_time(float(start + buckets[first] * bucket)),
+            "min": round(float(low), 2),
+            "max": round(float(high), 2),
+            "avg": round(float(mean), 2),
+            "count": int(count),
+        }
+        for first, low, high, mean, count in zip(starts, minimum, maximum, average, counts)
+    ]
+
+
+def create_history_store() -> Optional[HistoryStore]:
+    """History store configured from the environment, or None if disabled"""
+    root = os.environ.get("WEATHER_HISTORY_PATH")
+    if not root:
+        return None
+    return HistoryStore(
+        root,
+        retention_days=int(os.environ.get("WEATHER_HISTORY_RETENTION_DAYS", "30")),
+        max_bytes=int(os.environ.get("WEATHER_HISTORY_MAX_BYTES", str(256 * 1024 * 1024))),
+        compact_interval=float(os.environ.get("WEATHER_HISTORY_COMPACT_INTERVAL", "3600")),
+    )
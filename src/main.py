@@ -1,67 +1,297 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import Response
+from pydantic import BaseModel
 import requests
 from geopy.geocoders import Nominatim
-from typing import Dict
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional
+import asyncio
 import logging
+import os
+import time
+
+try:
+    from .admission import AdmissionController, Overloaded
+    from .alerts import DIRECTIONS, AlertEngine, LogSink, WebhookSink
+    from .binary_protocol import BinaryProtocolServer
+    from .cache import CacheBackend, create_cache_backend
+    from .conditions import canonical_record, parse_fields, parse_units, project, unit_labels
+    from .history import MAX_QUERY_SPAN, HistoryStore, create_history_store, downsample, format_time, parse_time
+    from .prefetch import HeavyHitters, PrefetchScheduler
+    from .providers import OpenMeteoProvider, ProviderRouter
+    from .snapshot import CacheSnapshotter
+    from .structured_logging import configure_logging
+except ImportError:  # running as a top-level module, e.g. uvicorn main:app
+    from admission import AdmissionController, Overloaded
+    from alerts import DIRECTIONS, AlertEngine, LogSink, WebhookSink
+    from binary_protocol import BinaryProtocolServer
+    from cache import CacheBackend, create_cache_backend
+    from conditions import canonical_record, parse_fields, parse_units, project, unit_labels
+    from history import MAX_QUERY_SPAN, HistoryStore, create_history_store, downsample, format_time, parse_time
+    from prefetch import HeavyHitters, PrefetchScheduler
+    from providers import OpenMeteoProvider, ProviderRouter
+    from snapshot import CacheSnapshotter
+    from structured_logging import configure_logging
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Weather Service", description="Get weather information for cities using Open-Meteo API")
+def worker_path(path: str) -> str:
+    """This worker's own variant of a file path, e.g. cache-1.snapshot for worker 1
+
+    Unchanged unless WEATHER_WORKER_INDEX is set, so a single process keeps
+    the configured path.
+    """
+    index = os.environ.get("WEATHER_WORKER_INDEX")
+    if index is None:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}-{index}{extension}"
+
+@asynccontextmanager
+async def cache_snapshots(path: str) -> AsyncIterator[None]:
+    """Restore cache snapshots on startup and write them periodically and on shutdown"""
+    snapshotter = CacheSnapshotter(
+        path,
+        {"geocode": weather_service.geocode_cache, "weather": weather_service.weather_cache},
+        interval=float(os.environ.get("WEATHER_CACHE_SNAPSHOT_INTERVAL", "300")),
+        max_restore_seconds=float(os.environ.get("WEATHER_CACHE_RESTORE_TIMEOUT", "2")),
+        max_bytes=int(os.environ.get("WEATHER_CACHE_SNAPSHOT_MAX_BYTES", str(64 * 1024 * 1024))),
+    )
+    await run_in_threadpool(snapshotter.try_restore)
+    periodic = asyncio.create_task(snapshotter.run_periodic())
+    try:
+        yield
+    finally:
+        periodic.cancel()
+        await run_in_threadpool(snapshotter.try_save)
+
+@asynccontextmanager
+async def binary_protocol_server(path: str) -> AsyncIterator[None]:
+    """Serve the binary protocol on a Unix socket alongside the HTTP API"""
+    server = BinaryProtocolServer(weather_service, admission)
+    await server.start(path)
+    try:
+        yield
+    finally:
+        await server.close()
+
+@asynccontextmanager
+async def history_compaction(history: HistoryStore) -> AsyncIterator[None]:
+    """Compact the observation history in the background"""
+    task = asyncio.create_task(history.run_periodic())
+    try:
+        yield
+    finally:
+        task.cancel()
+
+@asynccontextmanager
+async def prefetching(scheduler: PrefetchScheduler) -> AsyncIterator[None]:
+    """Refresh popular cities in the background before their entries expire"""
+    task = asyncio.create_task(scheduler.run_periodic())
+    try:
+        yield
+    finally:
+        task.cancel()
+
+@asynccontextmanager
+async def alert_refresher(interval: float) -> AsyncIterator[None]:
+    """Evaluate alert rules every interval seconds"""
+    async def run() -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_threadpool(alert_engine.refresh)
+            except Exception as e:
+                logger.error("Alert refresh failed: %s", e)
+
+    task = asyncio.create_task(run())
+    try:
+        yield
+    finally:
+        task.cancel()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Start optional background components and stop them on shutdown"""
+    async with AsyncExitStack() as stack:
+        snapshot_path = os.environ.get("WEATHER_CACHE_SNAPSHOT_PATH")
+        if snapshot_path:
+            await stack.enter_async_context(cache_snapshots(worker_path(snapshot_path)))
+        binary_socket = os.environ.get("WEATHER_BINARY_SOCKET")
+        if binary_socket:
+            await stack.enter_async_context(binary_protocol_server(worker_path(binary_socket)))
+        if weather_service.history is not None:
+            await stack.enter_async_context(history_compaction(weather_service.history))
+        if prefetcher.budget_per_minute > 0:
+            await stack.enter_async_context(prefetching(prefetcher))
+        if alerts_enabled:
+            await stack.enter_async_context(
+                alert_refresher(float(os.environ.get("ALERT_REFRESH_INTERVAL", "60")))
+            )
+        yield
+
+app = FastAPI(
+    title="Weather Service",
+    description="Get weather information for cities using Open-Meteo API",
+    lifespan=lifespan,
+)
 
 class WeatherService:
-    def __init__(self):
+    def __init__(
+        self,
+        geocode_cache: Optional[CacheBackend] = None,
+        weather_cache: Optional[CacheBackend] = None,
+        providers: Optional[ProviderRouter] = None,
+        history: Optional[HistoryStore] = None,
+    ):
         self.geolocator = Nominatim(user_agent="weather-service")
         self.open_meteo_base_url = "https://api.open-meteo.com/v1/forecast"
+        self.providers = providers or self._default_providers()
+        self.geocode_cache = geocode_cache or create_cache_backend("geocode")
+        self.weather_cache = weather_cache or create_cache_backend("weather")
+        self.geocode_ttl = float(os.environ.get("GEOCODE_CACHE_TTL", "86400"))
+        self.weather_ttl = float(os.environ.get("WEATHER_CACHE_TTL", "600"))
+        self.history = history if history is not None else create_history_store()
+    
+    def _default_providers(self) -> ProviderRouter:
+        """Open-Meteo plus any mirrors listed in OPEN_METEO_MIRROR_URLS"""
+        providers = [OpenMeteoProvider(self.open_meteo_base_url)]
+        for url in os.environ.get("OPEN_METEO_MIRROR_URLS", "").split(","):
+            if url.strip():
+                providers.append(OpenMeteoProvider(url.strip(), name=url.strip()))
+        hedge_after = os.environ.get("WEATHER_PROVIDER_HEDGE_AFTER")
+        return ProviderRouter(
+            providers, hedge_after=float(hedge_after) if hedge_after else None
+        )
+    
+    @staticmethod
+    def geocode_key(city_name: str) -> str:
+        """Cache key for a city name lookup"""
+        return " ".join(city_name.lower().split())
+    
+    @staticmethod
+    def weather_key(latitude: float, longitude: float) -> str:
+        """Cache key for a location, rounded to roughly 10 m"""
+        return f"{latitude:.4f},{longitude:.4f}"
+    
+    def is_cached(self, city_name: str) -> bool:
+        """True if a city's temperature can be served without upstream calls"""
+        # peek, so the lookup that follows is the only one counted in cache stats
+        coordinates = self.geocode_cache.peek(self.geocode_key(city_name))
+        if coordinates is None:
+            return False
+        return self.weather_cache.peek(self.weather_key(*coordinates)) is not None
+    
+    def get_cached_temperatures(self, city_names: Iterable[str]) -> Dict[str, float]:
+        """Temperatures for the cities that are fully cached, via batched multi-gets"""
+        geocode_keys = {name: self.geocode_key(name) for name in city_names}
+        coordinates = self.geocode_cache.get_many(set(geocode_keys.values()))
+        weather_keys = {
+            name: self.weather_key(*coordinates[key])
+            for name, key in geocode_keys.items()
+            if key in coordinates
+        }
+        records = self.weather_cache.get_many(set(weather_keys.values()))
+        return {
+            name: records[key]["temperature"]
+            for name, key in weather_keys.items()
+            if key in records
+        }
     
     def get_coordinates(self, city_name: str) -> tuple:
         """Convert city name to coordinates (latitude, longitude)"""
         try:
-            location = self.geolocator.geocode(city_name)
-            if location:
-                return location.latitude, location.longitude
-            else:
-                raise ValueError(f"City '{city_name}' not found")
+            latitude, longitude = self.geocode_cache.get_or_load(
+                self.geocode_key(city_name),
+                lambda: self._geocode(city_name),
+                self.geocode_ttl,
+            )
+            return latitude, longitude
         except Exception as e:
-            logger.error(f"Error getting coordinates for {city_name}: {str(e)}")
+            logger.error("Error getting coordinates for %s: %s", city_name, e)
             raise ValueError(f"Error finding coordinates for city '{city_name}': {str(e)}")
     
+    def _geocode(self, city_name: str) -> list:
+        """Look up a city with Nominatim"""
+        location = self.geolocator.geocode(city_name)
+        if location:
+            return [location.latitude, location.longitude]
+        else:
+            raise ValueError(f"City '{city_name}' not found")
+    
     def get_weather(self, latitude: float, longitude: float) -> float:
-        """Get current temperature from Open-Meteo API"""
+        """Get current temperature, served from cache when fresh"""
+        return self.get_current_conditions(latitude, longitude)["temperature"]
+    
+    def get_current_conditions(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        """Get the canonical current-conditions record, served from cache when fresh"""
+        return self.weather_cache.get_or_load(
+            self.weather_key(latitude, longitude),
+            lambda: self._fetch_conditions(latitude, longitude),
+            self.weather_ttl,
+        )
+    
+    def _fetch_conditions(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        """Get current conditions from the fastest healthy provider"""
         try:
-            params = {
-                "latitude": latitude,
-                "longitude": longitude,
-                "current_weather": "true",
-                "temperature_unit": "celsius"
-            }
-            
-            response = requests.get(self.open_meteo_base_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            current_weather = data.get("current_weather", {})
-            temperature = current_weather.get("temperature")
-            
-            if temperature is None:
-                raise ValueError("Temperature data not available")
-            
-            return temperature
+            current_weather = self.providers.fetch_current(latitude, longitude)
+            record = canonical_record(current_weather)
         except requests.RequestException as e:
-            logger.error(f"Error calling Open-Meteo API: {str(e)}")
+            logger.error("Error calling weather provider: %s", e)
             raise ValueError(f"Error fetching weather data: {str(e)}")
         except Exception as e:
-            logger.error(f"Error processing weather data: {str(e)}")
+            logger.error("Error processing weather data: %s", e)
             raise ValueError(f"Error processing weather data: {str(e)}")
+        self._record_observation(latitude, longitude, record)
+        return record
+    
+    def _record_observation(self, latitude: float, longitude: float, record: Dict[str, Any]) -> None:
+        """Append a fetched temperature to the observation history, if enabled"""
+        if self.history is None:
+            return
+        try:
+            self.history.append(latitude, longitude, time.time(), record["temperature"])
+        except OSError as e:
+            logger.error("Failed to record observation history: %s", e)
+    
+    def get_history(
+        self, city_name: str, start: float, end: float, bucket: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Observed temperatures for a city in [start, end], optionally per bucket"""
+        latitude, longitude = self.get_coordinates(city_name)
+        times, temperatures = self.history.query(latitude, longitude, start, end)
+        if bucket:
+            return {"buckets": downsample(times, temperatures, start, bucket)}
+        return {
+            "observations": [
+                {"time": format_time(float(t)), "temperature": round(float(v), 2)}
+                for t, v in zip(times, temperatures)
+            ]
+        }
+    
+    def refresh_conditions(self, latitude: float, longitude: float) -> bool:
+        """Replace a location's cached conditions with a fresh fetch
+        
+        Returns False without fetching if another worker is already filling it.
+        """
+        key = self.weather_key(latitude, longitude)
+        if not self.weather_cache.try_lock(key, self.weather_cache.lock_timeout):
+            return False
+        try:
+            self.weather_cache.set(key, self._fetch_conditions(latitude, longitude), self.weather_ttl)
+            return True
+        finally:
+            self.weather_cache.unlock(key)
     
     def get_city_temperature(self, city_name: str) -> str:
         """Get temperature for a city and return formatted string"""
         try:
             # Get coordinates
             latitude, longitude = self.get_coordinates(city_name)
-            logger.info(f"Found coordinates for {city_name}: {latitude}, {longitude}")
+            logger.info("Found coordinates for %s: %s, %s", city_name, latitude, longitude)
             
             # Get weather
             temperature = self.get_weather(latitude, longitude)
@@ -71,12 +301,55 @@ class WeatherService:
         
         except Exception as e:
             error_message = f"Error getting weather for '{city_name}': {str(e)}"
-            logger.error(error_message)
+            logger.error("Error getting weather for '%s': %s", city_name, e)
             return error_message
+    
+    def get_city_conditions(self, city_name: str) -> Dict[str, Any]:
+        """Get the canonical current-conditions record for a city"""
+        latitude, longitude = self.get_coordinates(city_name)
+        return self.get_current_conditions(latitude, longitude)
 
 # Initialize weather service
 weather_service = WeatherService()
 
+# Admission control for requests that need upstream calls
+admission = AdmissionController(
+    initial_limit=int(os.environ.get("ADMISSION_MAX_CONCURRENCY", "20")),
+    max_limit=int(os.environ.get("ADMISSION_MAX_LIMIT", "32")),
+    max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", "50")),
+    queue_timeout=float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "1.0")),
+)
+
+# Request popularity, used to refresh the most requested cities ahead of expiry
+popularity = HeavyHitters(k=int(os.environ.get("WEATHER_PREFETCH_TOP_K", "200")))
+prefetcher = PrefetchScheduler(
+    weather_service,
+    popularity,
+    budget_per_minute=float(os.environ.get("WEATHER_PREFETCH_BUDGET", "60")),
+    lead=float(os.environ.get("WEATHER_PREFETCH_LEAD", "30")),
+)
+
+# Threshold alerts, posted to ALERT_WEBHOOK_URL when set and logged otherwise
+alert_webhook_url = os.environ.get("ALERT_WEBHOOK_URL")
+alert_engine = AlertEngine(
+    weather_service, WebhookSink(alert_webhook_url) if alert_webhook_url else LogSink()
+)
+# Rules live in process memory, so with several workers only worker 0 owns them
+alerts_enabled = (
+    os.environ.get("ALERTS_ENABLED", "true").lower() == "true"
+    and os.environ.get("WEATHER_WORKER_INDEX", "0") == "0"
+)
+
+def require_alert_owner() -> None:
+    """Reject alert requests on workers that do not hold the rules"""
+    if not alerts_enabled:
+        raise HTTPException(status_code=503, detail="Alerts are not served by this worker")
+
+class AlertRuleRequest(BaseModel):
+    city: str
+    threshold: float
+    direction: str = "below"
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -85,15 +358,32 @@ async def root():
         "description": "Get weather information for cities",
         "endpoints": {
             "/weather/{city_name}": "Get current temperature for a city",
+            "/weather/{city_name}?fields=temperature,windspeed&units=imperial": "Get selected current conditions in metric or imperial units",
+            "/weather/{city_name}/history?from=...&to=...&bucket=3600": "Observed temperatures, optionally as min/max/avg per bucket of seconds",
+            "/cache/stats": "Cache memory use, eviction rates and prefetch activity",
+            "/alerts": "Register (POST) or remove (DELETE /alerts/{rule_id}) temperature threshold alerts",
             "/docs": "API documentation"
         }
     }
 
+async def lookup(city_name: str, func: Callable[[str], Any]) -> Any:
+    """Run a city lookup, applying admission control unless it is a cache hit"""
+    if await run_in_threadpool(weather_service.is_cached, city_name):
+        # Cache hits cost no upstream work, so they are never shed
+        return await run_in_threadpool(func, city_name)
+    return await admission.run(func, city_name)
+
 @app.get("/weather/{city_name}")
-async def get_weather(city_name: str) -> Dict[str, str]:
-    """Get current temperature for a specified city"""
+async def get_weather(
+    city_name: str, fields: Optional[str] = None, units: Optional[str] = None
+) -> Dict[str, Any]:
+    """Get current temperature, or selected current conditions, for a city"""
+    popularity.record(WeatherService.geocode_key(city_name))
     try:
-        result = weather_service.get_city_temperature(city_name)
+        if fields is not None or units is not None:
+            return await get_conditions(city_name, fields, units)
+        
+        result = await lookup(city_name, weather_service.get_city_temperature)
         
         # Check if result is an error message
         if result.startswith("Error"):
@@ -106,15 +396,143 @@ async def get_weather(city_name: str) -> Dict[str, str]:
     
     except HTTPException:
         raise
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         error_message = f"Error getting weather for '{city_name}': {str(e)}"
-        logger.error(error_message)
+        logger.error("Error getting weather for '%s': %s", city_name, e)
         raise HTTPException(status_code=500, detail=error_message)
 
+async def get_conditions(
+    city_name: str, fields: Optional[str], units: Optional[str]
+) -> Dict[str, Any]:
+    """Project the cached current-conditions record onto fields and units"""
+    try:
+        selected = parse_fields(fields)
+        units = parse_units(units)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        record = await lookup(city_name, weather_service.get_city_conditions)
+    except ValueError as e:
+        error_message = f"Error getting weather for '{city_name}': {str(e)}"
+        logger.error("Error getting weather for '%s': %s", city_name, e)
+        raise HTTPException(status_code=404, detail=error_message)
+    
+    return {
+        "city": city_name,
+        "units": unit_labels(selected, units),
+        "current": project(record, selected, units),
+    }
+
+@app.get("/weather/{city_name}/history")
+async def get_history(
+    city_name: str,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    bucket: Optional[float] = Query(None, gt=0),
+) -> Dict[str, Any]:
+    """Observed temperatures for a city over a time range, from the local history"""
+    if weather_service.history is None:
+        raise HTTPException(
+            status_code=503, detail="Observation history is disabled; set WEATHER_HISTORY_PATH"
+        )
+    try:
+        end_time = parse_time(end, time.time())
+        start_time = parse_time(start, end_time - 86400)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if start_time > end_time:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if end_time - start_time > MAX_QUERY_SPAN:
+        raise HTTPException(
+            status_code=400, detail=f"Range must not exceed {MAX_QUERY_SPAN // 86400} days"
+        )
+    
+    try:
+        history = await lookup(
+            city_name,
+            lambda name: weather_service.get_history(name, start_time, end_time, bucket),
+        )
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return {
+        "city": city_name,
+        "from": format_time(start_time),
+        "to": format_time(end_time),
+        **history,
+    }
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "service": "weather-service"}
+    """Health check endpoint, including saturation for autoscaling"""
+    return {
+        "status": "healthy",
+        "service": "weather-service",
+        "admission": admission.summary(),
+        "providers": weather_service.providers.summary(),
+    }
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Live memory use, hit rates and eviction rates of the caches"""
+    return {
+        "geocode": weather_service.geocode_cache.stats(),
+        "weather": weather_service.weather_cache.stats(),
+        "prefetch": prefetcher.summary(),
+    }
+
+@app.post("/alerts", status_code=201)
+async def create_alert(rule: AlertRuleRequest) -> Dict[str, Any]:
+    """Register a temperature threshold alert for a city"""
+    require_alert_owner()
+    if rule.direction not in DIRECTIONS:
+        raise HTTPException(
+            status_code=400, detail=f"Direction must be one of {', '.join(DIRECTIONS)}"
+        )
+    try:
+        latitude, longitude = await lookup(rule.city, weather_service.get_coordinates)
+        rule_id = alert_engine.rules.add(
+            rule.city, latitude, longitude, rule.threshold, rule.direction
+        )
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"rule_id": rule_id, "city": rule.city}
+
+@app.get("/alerts")
+async def alert_summary() -> Dict[str, Any]:
+    """Number of registered rules and the locations they watch"""
+    require_alert_owner()
+    return {
+        "rules": len(alert_engine.rules),
+        "locations": len(alert_engine.rules.active_locations()),
+    }
+
+@app.delete("/alerts/{rule_id}")
+async def delete_alert(rule_id: int) -> Dict[str, Any]:
+    """Remove a temperature threshold alert"""
+    require_alert_owner()
+    if not alert_engine.rules.remove(rule_id):
+        raise HTTPException(status_code=404, detail=f"Alert rule {rule_id} not found")
+    return {"rule_id": rule_id, "deleted": True}
 
 @app.get("/favicon.ico")
 async def favicon():
@@ -0,0 +1,176 @@
+"""
+Popularity-driven prefetch of current conditions.
+
+A handful of cities account for most requests, yet each expiry of a hot
+city's cache entry still makes one client wait on upstream. ``HeavyHitters``
+tracks request popularity in fixed memory: a count-min sketch estimates
+every city's recent request count, and a small table keeps the top k. The
+``PrefetchScheduler`` periodically refreshes the heavy hitters whose weather
+entries are about to expire, spending at most a configured number of
+upstream calls per minute.
+"""
+import asyncio
+import logging
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .store import MAX_SKETCH_DEPTH, sketch_indexes
+except ImportError:  # running as a top-level module, e.g. uvicorn main:app
+    from store import MAX_SKETCH_DEPTH, sketch_indexes
+
+logger = logging.getLogger(__name__)
+
+
+class HeavyHitters:
+    """Count-min sketch with a table of the k most requested keys
+
+    Counters are halved every ``decay_every`` requests so popularity follows
+    current traffic rather than all-time totals.
+    """
+
+    def __init__(self, k: int = 200, width: int = 4096, depth: int = 4, decay_every: int = 100_000):
+        if depth > MAX_SKETCH_DEPTH:
+            raise ValueError(f"Sketch depth must be at most {MAX_SKETCH_DEPTH}")
+        self.k = k
+        self.width = width
+        self.depth = depth
+        self.decay_every = decay_every
+        self.rows = [array("I", bytes(4 * width)) for _ in range(depth)]
+        self.top: Dict[str, int] = {}
+        self.additions = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def _indexes(self, key: str) -> List[int]:
+        return sketch_indexes(key, self.depth, self.width)
+
+    def record(self, key: str) -> None:
+        """Count one request for key"""
+        indexes = self._indexes(key)
+        with self._lock:
+            # Conservative update: only raise the counters that hold the minimum
+            estimate = min(row[index] for row, index in zip(self.rows, indexes)) + 1
+            for row, index in zip(self.rows, indexes):
+                if row[index] < estimate:
+                    row[index] = estimate
+            if key in self.top or len(self.top) < self.k:
+                self.top[key] = estimate
+            elif estimate > self._floor:
+                coldest = min(self.top, key=self.top.__getitem__)
+                if estimate > self.top[coldest]:
+                    del self.top[coldest]
+                    self.top[key] = estimate
+                self._floor = min(self.top.values())
+            self.additions += 1
+            if self.additions >= self.decay_every:
+                self._decay()
+
+    def estimate(self, key: str) -> int:
+        """Estimated recent request count for key"""
+        indexes = self._indexes(key)
+        with self._lock:
+            return min(row[index] for row, index in zip(self.rows, indexes))
+
+    def heavy_hitters(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Most requested keys with their estimated counts, most popular first"""
+        with self._lock:
+            ranked = sorted(self.top.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:n] if n is not None else ranked
+
+    def _decay(self) -> None:
+        for row in self.rows:
+            for index, count in enumerate(row):
+                if count:
+                    row[index] = count >> 1
+        self.top = {key: count >> 1 for key, count in self.top.items() if count > 1}
+        self._floor = min(self.top.values(), default=0)
+        self.additions = 0
+
+
+class PrefetchScheduler:
+    """Refresh popular cities just before their cached conditions expire"""
+
+    def __init__(
+        self,
+        service: Any,
+        hitters: HeavyHitters,
+        budget_per_minute: float = 60.0,
+        lead: float = 30.0,
+        interval: float = 5.0,
+    ):
+        self.service = service
+        self.hitters = hitters
+        self.budget_per_minute = budget_per_minute
+        self.lead = lead
+        self.interval = interval
+        self._tokens = budget_per_minute
+        self._last = time.monotonic()
+        self.refreshed = 0
+        self.failed = 0
+        self.deferred = 0
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        rate = self.budget_per_minute / 60
+        self._tokens = min(self.budget_per_minute, self._tokens + (now - self._last) * rate)
+        self._last = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def due(self) -> List[Tuple[str, float, float]]:
+        """Heavy hitters whose weather expires within the lead time, most popular first
+
+        Cities that are not geocoded in cache are skipped: prefetch never
+        spends geocoding calls.
+        """
+        due = []
+        for key, _ in self.hitters.heavy_hitters():
+            coordinates = self.service.geocode_cache.peek(key)
+            if coordinates is None:
+                continue
+            remaining = self.service.weather_cache.ttl(self.service.weather_key(*coordinates))
+            if remaining is None or remaining <= self.lead:
+                due.append((key, coordinates[0], coordinates[1]))
+        return due
+
+    def run_once(self) -> int:
+        """Refresh due heavy hitters within the budget; return how many were refreshed"""
+        refreshed = 0
+        due = self.due()
+        for index, (key, latitude, longitude) in enumerate(due):
+            if not self._take_token():
+                self.deferred += len(due) - index
+                break
+            try:
+                if self.service.refresh_conditions(latitude, longitude):
+                    refreshed += 1
+            except ValueError as e:
+                self.failed += 1
+                logger.warning("Prefetch of %s failed: %s", key, e)
+        self.refreshed += refreshed
+        return refreshed
+
+    async def run_periodic(self) -> None:
+        """Prefetch every interval seconds until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await loop.run_in_executor(None, self.run_once)
+            except Exception as e:
+                logger.error("Prefetch cycle failed: %s", e)
+
+    def summary(self) -> Dict[str, Any]:
+        """Budget, counters and the current heavy hitters"""
+        return {
+            "budget_per_minute": self.budget_per_minute,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "heavy_hitters": self.hitters.heavy_hitters(10),
+        }
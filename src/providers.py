@@ -0,0 +1,212 @@
+"""
+Weather data providers and latency-aware routing between them.
+
+Each provider returns the current-conditions record for a location. The
+``ProviderRouter`` keeps rolling latency and error rates per provider, sends
+each request to the fastest healthy one, falls back down the list on failure
+and can optionally race a second provider when the first is slow.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Room for a primary and a hedge call for each admitted request (at most
+# ADMISSION_MAX_LIMIT, 32 by default) plus the prefetch and alert refreshers,
+# so hedged calls never queue
+HEDGE_POOL_SIZE = 96
+
+
+class WeatherProvider:
+    """Interface for a source of current weather conditions"""
+
+    name = "provider"
+
+    def fetch_current(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        """Return the current-conditions record for a location"""
+        raise NotImplementedError
+
+
+class OpenMeteoProvider(WeatherProvider):
+    """Current conditions from the Open-Meteo forecast API"""
+
+    def __init__(
+        self,
+        base_url: str = "https://api.open-meteo.com/v1/forecast",
+        timeout: float = 10,
+        name: str = "open-meteo",
+    ):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.name = name
+
+    def fetch_current(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        params = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "current_weather": "true",
+            "temperature_unit": "celsius"
+        }
+
+        response = requests.get(self.base_url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+
+        current_weather = response.json().get("current_weather", {})
+        if current_weather.get("temperature") is None:
+            raise ValueError("Temperature data not available")
+        return current_weather
+
+
+class ProviderStats:
+    """Rolling latency and error rate for one provider"""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.last_failure = 0.0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, failed: bool) -> None:
+        """Fold one call into the rolling averages"""
+        with self._lock:
+            self.requests += 1
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.alpha * (latency - self.latency)
+            self.error_rate += self.alpha * (float(failed) - self.error_rate)
+            if failed:
+                self.last_failure = time.time()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Stats in a JSON-friendly form"""
+        return {
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "error_rate": round(self.error_rate, 3),
+            "requests": self.requests,
+        }
+
+
+class ProviderRouter:
+    """Route each request to the fastest healthy provider"""
+
+    def __init__(
+        self,
+        providers: Sequence[WeatherProvider],
+        hedge_after: Optional[float] = None,
+        error_threshold: float = 0.5,
+        cooldown: float = 30.0,
+        max_workers: int = HEDGE_POOL_SIZE,
+    ):
+        if not providers:
+            raise ValueError("At least one weather provider is required")
+        self.providers = list(providers)
+        self.hedge_after = hedge_after
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.max_workers = max_workers
+        self.stats = {provider.name: ProviderStats() for provider in self.providers}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def is_healthy(self, provider: WeatherProvider) -> bool:
+        """A provider is unhealthy while its error rate is high and recent"""
+        stats = self.stats[provider.name]
+        if stats.error_rate < self.error_threshold:
+            return True
+        # Let a probe through once the cooldown has passed
+        return time.time() - stats.last_failure > self.cooldown
+
+    def ranked(self) -> List[WeatherProvider]:
+        """Providers ordered healthy first, then by rolling latency"""
+        def sort_key(item):
+            index, provider = item
+            latency = self.stats[provider.name].latency
+            return (not self.is_healthy(provider), latency or 0.0, index)
+
+        return [provider for _, provider in sorted(enumerate(self.providers), key=sort_key)]
+
+    def _call(self, provider: WeatherProvider, latitude: float, longitude: float) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            record = provider.fetch_current(latitude, longitude)
+        except Exception:
+            self.stats[provider.name].record(time.perf_counter() - start, failed=True)
+            raise
+        self.stats[provider.name].record(time.perf_counter() - start, failed=False)
+        return record
+
+    def fetch_current(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        """Fetch current conditions, falling back across providers on failure"""
+        candidates = self.ranked()
+        if self.hedge_after is not None and len(candidates) > 1:
+            return self._fetch_hedged(candidates, latitude, longitude)
+
+        last_error: Optional[Exception] = None
+        for provider in candidates:
+            try:
+                return self._call(provider, latitude, longitude)
+            except Exception as e:
+                logger.warning("Provider %s failed: %s", provider.name, e)
+                last_error = e
+        raise last_error
+
+    def _fetch_hedged(
+        self, candidates: List[WeatherProvider], latitude: float, longitude: float
+    ) -> Dict[str, Any]:
+        """Start the best provider, racing the next one if it is slow or fails"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="weather-provider"
+            )
+        remaining = list(candidates)
+        pending: Dict[Future, WeatherProvider] = {}
+        last_error: Optional[Exception] = None
+
+        def launch() -> threading.Event:
+            provider = remaining.pop(0)
+            started = threading.Event()
+
+            def run() -> Dict[str, Any]:
+                started.set()
+                return self._call(provider, latitude, longitude)
+
+            pending[self._executor.submit(run)] = provider
+            return started
+
+        # The hedge delay counts from when the primary call starts, not from
+        # when it was queued, so a busy pool never looks like a slow provider
+        launch().wait()
+        while pending:
+            # Race at most two providers at a time
+            timeout = self.hedge_after if remaining and len(pending) < 2 else None
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Primary is slow: race the next provider for the tail
+                launch()
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    logger.warning("Provider %s failed: %s", provider.name, e)
+                    last_error = e
+            if not pending and remaining:
+                launch()
+        raise last_error
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider rolling stats and health"""
+        return {
+            provider.name: dict(
+                self.stats[provider.name].as_dict(), healthy=self.is_healthy(provider)
+            )
+            for provider in self.providers
+        }
@@ -1,21 +1,69 @@
 #!/usr/bin/env python3
 """
 Run the weather service
+
+By default the server listens on TCP port 8000 with auto-reload. Behind a
+local reverse proxy, bind a Unix domain socket instead:
+
+    python src/run_server.py --uds /run/weather/app.sock --workers 4
+
+Workers started this way cannot tell each other apart, so alerts are
+disabled and the binary protocol is refused when more than one is requested.
+Run one process per worker with WEATHER_WORKER_INDEX set (as the Docker
+image does) to use them.
 """
+import argparse
+import os
+import sys
+
 import uvicorn
-from main import app
+
+# Longer than nginx's upstream keepalive_timeout, so nginx always closes idle
+# connections first and never reuses one uvicorn has just dropped
+KEEP_ALIVE_TIMEOUT = 75
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the weather service")
+    parser.add_argument("--host", default="0.0.0.0", help="TCP address to bind")
+    parser.add_argument("--port", type=int, default=8000, help="TCP port to bind")
+    parser.add_argument("--uds", help="Bind this Unix domain socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes sharing the socket")
+    parser.add_argument("--no-reload", action="store_true", help="Disable auto-reload")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    # Auto-reload runs a single process, so it only applies to one worker
+    reload = not args.no_reload and args.workers == 1
+    if args.workers > 1:
+        if os.environ.get("WEATHER_BINARY_SOCKET"):
+            sys.exit(
+                "WEATHER_BINARY_SOCKET needs a single worker: "
+                "each one would replace the others' socket"
+            )
+        # Alert rules live in one process; split across workers they would be lost
+        os.environ["ALERTS_ENABLED"] = "false"
+        print("Alerts are disabled with more than one worker")
+
     print("Starting Weather Service...")
-    print("API will be available at: http://localhost:8000")
-    print("API documentation at: http://localhost:8000/docs")
-    print("Example usage: http://localhost:8000/weather/London")
+    if args.uds:
+        print(f"API will be available on Unix socket: {args.uds}")
+        print(f"Example usage: curl --unix-socket {args.uds} http://localhost/weather/London")
+    else:
+        print(f"API will be available at: http://localhost:{args.port}")
+        print(f"API documentation at: http://localhost:{args.port}/docs")
+        print(f"Example usage: http://localhost:{args.port}/weather/London")
     print("\nPress Ctrl+C to stop the server")
-    
+
     uvicorn.run(
         "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,  # Auto-reload on code changes
+        host=args.host,
+        port=args.port,
+        uds=args.uds,
+        workers=args.workers,
+        reload=reload,  # Auto-reload on code changes
+        timeout_keep_alive=KEEP_ALIVE_TIMEOUT,
         log_level="info"
     )
@@ -0,0 +1,208 @@
+"""
+Cache snapshots that survive restarts and deploys.
+
+``CacheSnapshotter`` writes the live entries of the in-process caches to a
+compact binary file and restores them on startup, so a restarted process
+does not stampede upstream while its caches refill.
+
+File layout (all integers little-endian)::
+
+    magic "WSNP" | version u16 | payload length u32 | payload crc32 u32
+    zlib(payload)
+
+    payload   = section count u16, then per section:
+                name length u8 | name | entry count u32 | entries
+    entry     = key length u16 | key | expires_at f64 | value length u32 | JSON value
+
+Entries are written freshest first, so a time-bounded restore keeps the
+entries with the most life left. The payload is capped at ``max_bytes`` on
+save, and larger files are refused on restore, so reading and decompressing
+a snapshot is bounded as well.
+"""
+import asyncio
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+
+try:
+    from .cache import CacheBackend
+except ImportError:  # running as a top-level module, e.g. uvicorn main:app
+    from cache import CacheBackend
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WSNP"
+VERSION = 1
+_HEADER = struct.Struct("<4sHII")
+_SECTION = struct.Struct("<I")
+_ENTRY_KEY = struct.Struct("<H")
+_ENTRY_META = struct.Struct("<dI")
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, corrupt or incompatible"""
+
+
+class CacheSnapshotter:
+    """Save and restore a named set of caches to a snapshot file"""
+
+    def __init__(
+        self,
+        path: str,
+        caches: Dict[str, CacheBackend],
+        interval: float = 300.0,
+        max_restore_seconds: float = 2.0,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.path = path
+        self.caches = caches
+        self.interval = interval
+        self.max_restore_seconds = max_restore_seconds
+        self.max_bytes = max_bytes
+
+    def encode(self) -> bytes:
+        """Serialize every cache's live entries into snapshot bytes
+
+        Entries that would take the payload past max_bytes are left out.
+        """
+        parts = [struct.pack("<H", len(self.caches))]
+        size = 2
+        for name, cache in self.caches.items():
+            entries = sorted(cache.entries(), key=lambda entry: entry[1], reverse=True)
+            encoded_name = name.encode("utf-8")
+            size += 1 + len(encoded_name) + _SECTION.size
+            records = []
+            for key, expires_at, value in entries:
+                encoded_key = key.encode("utf-8")
+                encoded_value = json.dumps(value, separators=(",", ":")).encode("utf-8")
+                record = (
+                    _ENTRY_KEY.pack(len(encoded_key)) + encoded_key
+                    + _ENTRY_META.pack(expires_at, len(encoded_value)) + encoded_value
+                )
+                if size + len(record) > self.max_bytes:
+                    break
+                size += len(record)
+                records.append(record)
+            parts.append(struct.pack("<B", len(encoded_name)) + encoded_name)
+            parts.append(_SECTION.pack(len(records)))
+            parts.extend(records)
+        payload = b"".join(parts)
+        header = _HEADER.pack(MAGIC, VERSION, len(payload), zlib.crc32(payload))
+        return header + zlib.compress(payload)
+
+    def save(self) -> int:
+        """Atomically write a snapshot; return its size in bytes"""
+        data = self.encode()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return len(data)
+
+    @staticmethod
+    def decode_payload(data: bytes, max_bytes: Optional[int] = None) -> bytes:
+        """Validate snapshot bytes and return the decompressed payload"""
+        if len(data) < _HEADER.size:
+            raise SnapshotError("Snapshot is truncated")
+        magic, version, length, checksum = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise SnapshotError("Not a cache snapshot")
+        if version != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}")
+        if max_bytes is not None and length > max_bytes:
+            raise SnapshotError(f"Snapshot payload of {length} bytes exceeds {max_bytes}")
+        try:
+            # Never inflate past the declared length, however the stream claims to continue
+            payload = zlib.decompressobj().decompress(data[_HEADER.size:], length + 1)
+        except zlib.error as e:
+            raise SnapshotError(f"Snapshot is corrupt: {e}")
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            raise SnapshotError("Snapshot checksum mismatch")
+        return payload
+
+    def restore(self) -> Tuple[int, int]:
+        """Load a snapshot into the caches; return (restored, skipped) counts
+
+        Entries that have expired are skipped, and restoring stops once
+        max_restore_seconds have passed, counted from before the file is read,
+        so a large file cannot delay readiness.
+        """
+        deadline = time.perf_counter() + self.max_restore_seconds
+        size = os.path.getsize(self.path)
+        # zlib output exceeds its input by at most a small fraction
+        if size > _HEADER.size + self.max_bytes + self.max_bytes // 100 + 1024:
+            raise SnapshotError(f"Snapshot of {size} bytes exceeds {self.max_bytes}")
+        with open(self.path, "rb") as f:
+            payload = self.decode_payload(f.read(), self.max_bytes)
+
+        now = time.time()
+        restored = skipped = 0
+        (sections,) = struct.unpack_from("<H", payload)
+        offset = 2
+        for _ in range(sections):
+            name_length = payload[offset]
+            name = payload[offset + 1:offset + 1 + name_length].decode("utf-8")
+            offset += 1 + name_length
+            (count,) = _SECTION.unpack_from(payload, offset)
+            offset += _SECTION.size
+            cache = self.caches.get(name)
+            for _ in range(count):
+                (key_length,) = _ENTRY_KEY.unpack_from(payload, offset)
+                offset += _ENTRY_KEY.size
+                key = payload[offset:offset + key_length].decode("utf-8")
+                offset += key_length
+                expires_at, value_length = _ENTRY_META.unpack_from(payload, offset)
+                offset += _ENTRY_META.size
+                raw_value = payload[offset:offset + value_length]
+                offset += value_length
+                if cache is None or expires_at <= now or time.perf_counter() > deadline:
+                    skipped += 1
+                    continue
+                cache.restore(key, json.loads(raw_value), expires_at)
+                restored += 1
+        return restored, skipped
+
+    def try_restore(self) -> None:
+        """Restore if a snapshot exists, logging rather than raising on failure"""
+        if not os.path.exists(self.path):
+            logger.info("No cache snapshot at %s", self.path)
+            return
+        start = time.perf_counter()
+        try:
+            restored, skipped = self.restore()
+        except (OSError, SnapshotError, ValueError, struct.error) as e:
+            logger.warning("Ignoring unreadable cache snapshot %s: %s", self.path, e)
+            return
+        logger.info(
+            "Restored %d cache entries (%d skipped) from %s in %.0f ms",
+            restored, skipped, self.path, (time.perf_counter() - start) * 1000,
+        )
+
+    def try_save(self) -> None:
+        """Save a snapshot, logging rather than raising on failure"""
+        try:
+            size = self.save()
+        except OSError as e:
+            logger.warning("Could not write cache snapshot %s: %s", self.path, e)
+            return
+        logger.info("Wrote %d byte cache snapshot to %s", size, self.path)
+
+    async def run_periodic(self) -> None:
+        """Save a snapshot every interval seconds until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            await loop.run_in_executor(None, self.try_save)
@@ -0,0 +1,341 @@
+"""
+Memory-bounded storage for the in-process caches.
+
+``TinyLFUStore`` keeps entries within a byte budget rather than an entry
+count, so a flood of distinct user-supplied city names cannot grow memory
+without bound. Eviction follows W-TinyLFU: new entries land in a small LRU
+window, and an entry leaving the window only displaces a main-region entry
+if a count-min sketch says it has been requested more often. One-off keys
+from a scan therefore never push out the popular ones.
+
+Entries are compact: keys are interned, and values are packed into bytes by
+``pack_value`` (coordinates and current-conditions records as fixed structs,
+anything else as JSON).
+"""
+import calendar
+import json
+import math
+import struct
+import sys
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Field order of current-conditions records, matching conditions.FIELDS
+_RECORD_FIELDS = ("temperature", "windspeed", "winddirection", "weathercode", "is_day", "time")
+_COORDINATES = struct.Struct("<cdd")
+_RECORD = struct.Struct("<cBdddhbq")
+_TIME_FORMAT = "%Y-%m-%dT%H:%M"
+
+# Estimated bookkeeping per entry beyond the entry object, key and value:
+# the OrderedDict node and hash table slot that index it
+INDEX_OVERHEAD = 120
+
+_HALVE = bytes(count >> 1 for count in range(256))
+
+# One odd 64-bit multiplier per count-min sketch row
+_SKETCH_MULTIPLIERS = (
+    0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+    0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0x94D049BB133111EB, 0xBF58476D1CE4E5B9,
+)
+MAX_SKETCH_DEPTH = len(_SKETCH_MULTIPLIERS)
+_MASK64 = (1 << 64) - 1
+
+# Regions an entry can live in
+WINDOW, PROBATION, PROTECTED = 0, 1, 2
+
+
+def _pack_record(record: Dict[str, Any]) -> Optional[bytes]:
+    if not set(record) <= set(_RECORD_FIELDS):
+        return None
+    try:
+        mask = 0
+        for bit, field in enumerate(_RECORD_FIELDS):
+            if record.get(field) is not None:
+                mask |= 1 << bit
+        timestamp = record.get("time")
+        return _RECORD.pack(
+            b"w",
+            mask,
+            float(record.get("temperature") or 0.0),
+            float(record.get("windspeed") or 0.0),
+            float(record.get("winddirection") or 0.0),
+            int(record.get("weathercode") or 0),
+            int(record.get("is_day") or 0),
+            calendar.timegm(time.strptime(timestamp, _TIME_FORMAT)) if timestamp else 0,
+        )
+    except (TypeError, ValueError, struct.error):
+        return None
+
+
+def _unpack_record(data: bytes) -> Dict[str, Any]:
+    _, mask, *values = _RECORD.unpack(data)
+    values[-1] = time.strftime(_TIME_FORMAT, time.gmtime(values[-1]))
+    return {
+        field: value
+        for bit, (field, value) in enumerate(zip(_RECORD_FIELDS, values))
+        if mask & (1 << bit)
+    }
+
+
+def pack_value(value: Any) -> bytes:
+    """Encode a cache value as compact bytes"""
+    if (
+        isinstance(value, (list, tuple))
+        and len(value) == 2
+        and all(isinstance(v, float) for v in value)
+    ):
+        return _COORDINATES.pack(b"c", *value)
+    if isinstance(value, dict):
+        packed = _pack_record(value)
+        if packed is not None:
+            return packed
+    return b"j" + json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def unpack_value(data: bytes) -> Any:
+    """Decode bytes produced by pack_value"""
+    tag = data[:1]
+    if tag == b"c":
+        return list(_COORDINATES.unpack(data)[1:])
+    if tag == b"w":
+        return _unpack_record(data)
+    return json.loads(data[1:])
+
+
+class CacheEntry:
+    """One cached value with its expiry and accounted size"""
+
+    __slots__ = ("key", "data", "expires_at", "size", "region")
+
+    def __init__(self, key: str, data: bytes, expires_at: float):
+        self.key = key
+        self.data = data
+        self.expires_at = expires_at
+        self.size = sys.getsizeof(self) + sys.getsizeof(key) + sys.getsizeof(data) + INDEX_OVERHEAD
+        self.region = WINDOW
+
+
+def sketch_indexes(key: str, depth: int, width: int) -> List[int]:
+    """Counter index of key in each of the first depth rows of a count-min sketch
+
+    Each row multiplies the key's hash by its own odd constant and keeps the
+    high bits (multiply-shift hashing), so keys collide independently per row.
+    """
+    h = hash(key) & _MASK64
+    return [((h * multiplier & _MASK64) >> 32) % width for multiplier in _SKETCH_MULTIPLIERS[:depth]]
+
+
+class FrequencySketch:
+    """Count-min sketch of recent access frequency with periodic aging"""
+
+    depth = 4
+    max_count = 15
+
+    def __init__(self, width: int):
+        self.width = 1 << max(4, math.ceil(math.log2(max(width, 1))))
+        self.rows = [bytearray(self.width) for _ in range(self.depth)]
+        self.sample_size = 10 * self.width
+        self.additions = 0
+
+    def _indexes(self, key: str) -> List[int]:
+        return sketch_indexes(key, self.depth, self.width)
+
+    def increment(self, key: str) -> None:
+        """Record one access to key"""
+        for row, index in zip(self.rows, self._indexes(key)):
+            if row[index] < self.max_count:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key: str) -> int:
+        """Estimated recent access count for key"""
+        return min(row[index] for row, index in zip(self.rows, self._indexes(key)))
+
+    def _age(self) -> None:
+        # Halve every counter so old popularity fades
+        for row in self.rows:
+            row[:] = row.translate(_HALVE)
+        self.additions //= 2
+
+
+class TinyLFUStore:
+    """Byte-budgeted key/value store with W-TinyLFU eviction
+
+    Not thread-safe; callers serialize access.
+    """
+
+    def __init__(self, max_bytes: int, window_fraction: float = 0.01, protected_fraction: float = 0.8):
+        self.max_bytes = max_bytes
+        self.window_budget = max(1, int(max_bytes * window_fraction))
+        main_budget = max_bytes - self.window_budget
+        self.protected_budget = int(main_budget * protected_fraction)
+        self.sketch = FrequencySketch(max_bytes // 256)
+        self._entries: Dict[str, CacheEntry] = {}
+        self._regions: Tuple["OrderedDict[str, CacheEntry]", ...] = (
+            OrderedDict(), OrderedDict(), OrderedDict()
+        )
+        self._region_bytes = [0, 0, 0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        self.expirations = 0
+        self._recent_evictions: Deque[List[int]] = deque(maxlen=60)
+
+    @property
+    def bytes_used(self) -> int:
+        """Accounted bytes across all regions"""
+        return sum(self._region_bytes)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str, now: float) -> Optional[Any]:
+        """Return the value for key, or None if missing or expired"""
+        self.sketch.increment(key)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= now:
+            self._remove(entry)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._on_hit(entry)
+        return unpack_value(entry.data)
+
+    def peek(self, key: str, now: float) -> Optional[Any]:
+        """Return the value for key without counting a hit, miss or access"""
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= now:
+            return None
+        return unpack_value(entry.data)
+
+    def expires_at(self, key: str) -> Optional[float]:
+        """Expiry time of key, without counting it as an access"""
+        entry = self._entries.get(key)
+        return entry.expires_at if entry is not None else None
+
+    def put(self, key: str, value: Any, expires_at: float) -> None:
+        """Insert or replace key"""
+        key = sys.intern(key)
+        existing = self._entries.get(key)
+        if existing is not None:
+            self._remove(existing)
+        entry = CacheEntry(key, pack_value(value), expires_at)
+        if entry.size > self.max_bytes - self.window_budget:
+            self.rejections += 1
+            return
+        self._entries[key] = entry
+        self._link(entry, WINDOW)
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        """Remove key if present"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._remove(entry)
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        self._entries.clear()
+        for region in self._regions:
+            region.clear()
+        self._region_bytes = [0, 0, 0]
+
+    def items(self) -> Iterator[Tuple[str, float, Any]]:
+        """Yield (key, expires_at, value) for every stored entry"""
+        for entry in list(self._entries.values()):
+            yield entry.key, entry.expires_at, unpack_value(entry.data)
+
+    def _link(self, entry: CacheEntry, region: int) -> None:
+        entry.region = region
+        self._regions[region][entry.key] = entry
+        self._region_bytes[region] += entry.size
+
+    def _unlink(self, entry: CacheEntry) -> None:
+        del self._regions[entry.region][entry.key]
+        self._region_bytes[entry.region] -= entry.size
+
+    def _remove(self, entry: CacheEntry) -> None:
+        self._unlink(entry)
+        del self._entries[entry.key]
+
+    def _on_hit(self, entry: CacheEntry) -> None:
+        if entry.region == PROBATION:
+            self._unlink(entry)
+            self._link(entry, PROTECTED)
+            # Keep the protected segment within budget by demoting its LRU entries
+            protected = self._regions[PROTECTED]
+            while self._region_bytes[PROTECTED] > self.protected_budget and len(protected) > 1:
+                demoted = next(iter(protected.values()))
+                self._unlink(demoted)
+                self._link(demoted, PROBATION)
+        else:
+            self._regions[entry.region].move_to_end(entry.key)
+
+    def _evict(self) -> None:
+        window = self._regions[WINDOW]
+        while self._region_bytes[WINDOW] > self.window_budget and window:
+            candidate = next(iter(window.values()))
+            self._unlink(candidate)
+            self._link(candidate, PROBATION)
+            self._admit(candidate)
+
+    def _admit(self, candidate: CacheEntry) -> None:
+        """Make room in the main region, keeping whichever side is more popular"""
+        main_budget = self.max_bytes - self.window_budget
+        while self._region_bytes[PROBATION] + self._region_bytes[PROTECTED] > main_budget:
+            victim = self._next_victim(candidate)
+            if victim is None:
+                return
+            if victim is not candidate and (
+                self.sketch.estimate(candidate.key) <= self.sketch.estimate(victim.key)
+            ):
+                victim = candidate
+            self._remove(victim)
+            self._record_eviction()
+            if victim is candidate:
+                return
+
+    def _next_victim(self, candidate: CacheEntry) -> Optional[CacheEntry]:
+        for region in (PROBATION, PROTECTED):
+            for entry in self._regions[region].values():
+                if entry is not candidate:
+                    return entry
+        return candidate if candidate.key in self._entries else None
+
+    def _record_eviction(self) -> None:
+        self.evictions += 1
+        second = int(time.monotonic())
+        if self._recent_evictions and self._recent_evictions[-1][0] == second:
+            self._recent_evictions[-1][1] += 1
+        else:
+            self._recent_evictions.append([second, 1])
+
+    def eviction_rate(self) -> float:
+        """Evictions per second over the last minute"""
+        cutoff = int(time.monotonic()) - 60
+        return sum(count for second, count in self._recent_evictions if second > cutoff) / 60
+
+    def stats(self) -> Dict[str, Any]:
+        """Memory use, hit rate and eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes_used": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "evictions_per_second": round(self.eviction_rate(), 3),
+            "rejections": self.rejections,
+            "expirations": self.expirations,
+        }
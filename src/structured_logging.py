@@ -0,0 +1,173 @@
+"""
+Queue-based logging pipeline that keeps log I/O off the request path.
+
+Request handlers only put the unformatted ``LogRecord`` on a bounded queue;
+a ``QueueListener`` thread formats it (as text or JSON) and writes it out.
+High-volume info lines are rate limited per message template, and records
+are dropped rather than blocking when the queue is full.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Dict, Optional, Tuple
+
+# uvicorn gives these loggers their own stream handlers and stops propagation
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "suppressed",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """Render each record as a single-line JSON object"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """``logging.BASIC_FORMAT`` lines, noting how many similar lines were dropped"""
+
+    def __init__(self) -> None:
+        super().__init__(logging.BASIC_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            line += f" ({suppressed} similar lines suppressed)"
+        return line
+
+
+class RateLimitFilter(logging.Filter):
+    """Token-bucket rate limit per message template for records below WARNING
+
+    Records are keyed by logger name and unformatted message, so every call
+    site is its own message type. The number of records dropped since the
+    last one let through is attached to it as ``suppressed``.
+    """
+
+    def __init__(self, rate: float, overrides: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.rate = rate
+        self.overrides = overrides or {}
+        self._buckets: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._suppressed: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        template = str(record.msg)
+        rate = self.overrides.get(template, self.rate)
+        if rate <= 0:
+            return True
+
+        key = (record.name, template)
+        # Rates below one line per second still need room for a whole token
+        capacity = max(rate, 1.0)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            if tokens < 1.0:
+                self._buckets[key] = (tokens, now)
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+            self._buckets[key] = (tokens - 1.0, now)
+            record.suppressed = self._suppressed.pop(key, 0)
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that defers formatting and drops records when the queue is full"""
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the listener thread, not in the request handler
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    json_output: Optional[bool] = None,
+    sample_rate: Optional[float] = None,
+    queue_size: Optional[int] = None,
+    stream: Optional[IO[str]] = None,
+    force: bool = False,
+) -> Optional[QueueListener]:
+    """Install the queue-based pipeline on the root logger
+
+    Unset arguments come from LOG_LEVEL, LOG_FORMAT (``text`` or ``json``),
+    LOG_SAMPLE_RATE (records per second per message template, 0 to disable)
+    and LOG_QUEUE_SIZE. Like ``logging.basicConfig``, nothing is changed if
+    the root logger already has handlers, unless force is set. uvicorn's own
+    loggers are routed through the queue too, so access lines are never
+    written from the event loop.
+    """
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return None
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    if json_output is None:
+        json_output = os.environ.get("LOG_FORMAT", "text").lower() == "json"
+    if sample_rate is None:
+        sample_rate = float(os.environ.get("LOG_SAMPLE_RATE", "20"))
+    if queue_size is None:
+        queue_size = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if json_output:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(TextFormatter())
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter(sample_rate))
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        for uvicorn_handler in list(uvicorn_logger.handlers):
+            uvicorn_logger.removeHandler(uvicorn_handler)
+        uvicorn_logger.propagate = True
+
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
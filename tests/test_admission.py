@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Unit tests for admission control and load shedding
+"""
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main
+from src.admission import AdmissionController, Overloaded
+from src.main import WeatherService, app
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the FastAPI app"""
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def saturated():
+    """Swap in a controller with every slot taken and no queue"""
+    controller = AdmissionController(initial_limit=2, max_queue=0)
+    controller.in_flight = 2
+    with patch.object(main, "admission", controller):
+        yield controller
+
+
+class TestAdmissionController:
+    """Test cases for the AdmissionController"""
+
+    def test_admits_up_to_limit(self):
+        async def scenario():
+            controller = AdmissionController(initial_limit=2, max_queue=0)
+            async with controller.admit():
+                async with controller.admit():
+                    assert controller.in_flight == 2
+                    with pytest.raises(Overloaded):
+                        async with controller.admit():
+                            pass
+            assert controller.in_flight == 0
+            assert controller.rejected == 1
+
+        asyncio.run(scenario())
+
+    def test_run_holds_a_slot_on_dedicated_threads(self):
+        async def scenario():
+            controller = AdmissionController(initial_limit=2)
+
+            def work():
+                return threading.current_thread().name, controller.in_flight
+
+            name, in_flight = await controller.run(work)
+            assert name.startswith("admitted")
+            assert in_flight == 1
+            assert controller.in_flight == 0
+
+        asyncio.run(scenario())
+
+    def test_queued_request_gets_released_slot(self):
+        async def scenario():
+            controller = AdmissionController(initial_limit=1, max_queue=1, queue_timeout=1.0)
+            order = []
+
+            async def hold():
+                async with controller.admit():
+                    order.append("first")
+                    await asyncio.sleep(0.05)
+
+            async def wait_in_queue():
+                await asyncio.sleep(0.01)
+                async with controller.admit():
+                    order.append("second")
+
+            await asyncio.gather(hold(), wait_in_queue())
+            assert order == ["first", "second"]
+            assert controller.in_flight == 0
+
+        asyncio.run(scenario())
+
+    def test_queue_timeout_rejects(self):
+        async def scenario():
+            controller = AdmissionController(initial_limit=1, max_queue=1, queue_timeout=0.01)
+            async with controller.admit():
+                with pytest.raises(Overloaded) as excinfo:
+                    async with controller.admit():
+                        pass
+            assert excinfo.value.retry_after >= 1
+            assert controller.queued == 0
+
+        asyncio.run(scenario())
+
+    def test_limit_shrinks_when_latency_rises(self):
+        controller = AdmissionController(initial_limit=50)
+        for _ in range(20):
+            controller._update_limit(0.05)
+        steady_limit = controller.limit
+        for _ in range(20):
+            controller._update_limit(1.0)
+        assert controller.limit < steady_limit
+
+    def test_limit_grows_under_load_with_steady_latency(self):
+        controller = AdmissionController(initial_limit=10)
+        controller.in_flight = 10
+        for _ in range(20):
+            controller._update_limit(0.05)
+        assert controller.limit > 10
+
+    def test_saturation_reporting(self):
+        controller = AdmissionController(initial_limit=10, max_queue=10)
+        controller.in_flight = 5
+        assert controller.summary()["saturation"] == 0.25
+
+
+class TestLoadShedding:
+    """Test cases for shedding at the /weather endpoint"""
+
+    @patch.object(WeatherService, 'is_cached', return_value=False)
+    @patch.object(WeatherService, 'get_city_temperature')
+    def test_saturated_miss_returns_503(self, mock_get_temp, mock_is_cached, client, saturated):
+        response = client.get("/weather/London")
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+        mock_get_temp.assert_not_called()
+
+    @patch.object(WeatherService, 'is_cached', return_value=True)
+    @patch.object(WeatherService, 'get_city_temperature')
+    def test_cache_hit_never_shed(self, mock_get_temp, mock_is_cached, client, saturated):
+        mock_get_temp.return_value = "15 Celsius now in London"
+        response = client.get("/weather/London")
+        assert response.status_code == 200
+        assert response.json()["result"] == "15 Celsius now in London"
+
+    def test_health_reports_saturation(self, client, saturated):
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["admission"]["saturation"] == 1.0
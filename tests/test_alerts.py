@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Unit tests for threshold alerts
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main
+from src.alerts import AlertEngine, AlertRules, WebhookSink
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the FastAPI app"""
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def webhook():
+    """Local HTTP server that records the JSON bodies posted to it"""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers["Content-Length"])
+            received.append(json.loads(self.rfile.read(length)))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/hook", received
+    server.shutdown()
+    server.server_close()
+
+
+class TestAlertRules:
+    """Test cases for vectorized rule evaluation"""
+
+    def test_rules_fire_on_crossing_only(self):
+        rules = AlertRules()
+        below = rules.add("London", 51.5074, -0.1278, 0.0, "below")
+        above = rules.add("London", 51.5074, -0.1278, 30.0, "above")
+
+        assert rules.evaluate(np.array([5.0])).tolist() == []
+        fired = rules.evaluate(np.array([-1.0]))
+        assert [int(rules.rule_ids[slot]) for slot in fired] == [below]
+        # Still below: no repeat
+        assert rules.evaluate(np.array([-2.0])).tolist() == []
+        fired = rules.evaluate(np.array([31.0]))
+        assert [int(rules.rule_ids[slot]) for slot in fired] == [above]
+
+    def test_rules_rearm_after_recovering(self):
+        rules = AlertRules()
+        rules.add("London", 51.5074, -0.1278, 0.0, "below")
+        assert len(rules.evaluate(np.array([-1.0]))) == 1
+        assert len(rules.evaluate(np.array([1.0]))) == 0
+        assert len(rules.evaluate(np.array([-1.0]))) == 1
+
+    def test_unknown_temperature_keeps_state(self):
+        rules = AlertRules()
+        rules.add("London", 51.5074, -0.1278, 0.0, "below")
+        rules.evaluate(np.array([-1.0]))
+        assert len(rules.evaluate(np.array([np.nan]))) == 0
+        assert len(rules.evaluate(np.array([-1.0]))) == 0
+
+    def test_rules_grouped_by_location(self):
+        rules = AlertRules(capacity=2)
+        for threshold in range(10):
+            rules.add("London", 51.5074, -0.1278, float(threshold), "above")
+        rules.add("Paris", 48.8566, 2.3522, 0.0, "above")
+        assert len(rules) == 11
+        assert rules.locations == [(51.5074, -0.1278), (48.8566, 2.3522)]
+
+    def test_removed_rules_do_not_fire(self):
+        rules = AlertRules()
+        rule_id = rules.add("London", 51.5074, -0.1278, 0.0, "below")
+        assert rules.remove(rule_id)
+        assert not rules.remove(rule_id)
+        assert rules.evaluate(np.array([-1.0])).tolist() == []
+        assert rules.active_locations() == []
+
+    def test_invalid_direction_rejected(self):
+        with pytest.raises(ValueError):
+            AlertRules().add("London", 51.5074, -0.1278, 0.0, "sideways")
+
+    def test_100k_rules_evaluate_quickly(self):
+        rules = AlertRules()
+        rng = np.random.default_rng(0)
+        for i in range(100_000):
+            rules.add(f"city-{i % 1000}", i % 1000, 0.0, float(rng.uniform(-20, 40)), "above")
+        temperatures = rng.uniform(-20, 40, size=len(rules.locations))
+
+        timings = []
+        for _ in range(20):
+            start = time.perf_counter()
+            rules.evaluate(temperatures)
+            timings.append(time.perf_counter() - start)
+        # Best of 20 runs, against a 1ms target with 2x headroom for slow CI machines
+        assert min(timings) < 0.002
+
+
+class TestAlertEngine:
+    """Test cases for fetching locations and delivering alerts"""
+
+    def test_each_location_fetched_once(self):
+        service = Mock()
+        service.get_current_conditions.return_value = {"temperature": -5.0}
+        engine = AlertEngine(service, Mock())
+        for threshold in (0.0, 1.0, 2.0):
+            engine.rules.add("London", 51.5074, -0.1278, threshold, "below")
+
+        alerts = engine.refresh()
+
+        service.get_current_conditions.assert_called_once_with(51.5074, -0.1278)
+        assert len(alerts) == 3
+        engine.sink.deliver.assert_called_once_with(alerts)
+
+    def test_failed_location_skipped(self):
+        service = Mock()
+        service.get_current_conditions.side_effect = ValueError("Error fetching weather data")
+        engine = AlertEngine(service, Mock())
+        engine.rules.add("London", 51.5074, -0.1278, 0.0, "below")
+
+        assert engine.refresh() == []
+        engine.sink.deliver.assert_not_called()
+
+    def test_no_rules_makes_no_calls(self):
+        service = Mock()
+        assert AlertEngine(service, Mock()).refresh() == []
+        service.get_current_conditions.assert_not_called()
+
+    def test_webhook_receives_alerts(self, webhook):
+        url, received = webhook
+        service = Mock()
+        service.get_current_conditions.return_value = {"temperature": 35.5}
+        engine = AlertEngine(service, WebhookSink(url))
+        rule_id = engine.rules.add("Paris", 48.8566, 2.3522, 30.0, "above")
+
+        engine.refresh()
+
+        assert received == [{
+            "alerts": [{
+                "rule_id": rule_id,
+                "city": "Paris",
+                "direction": "above",
+                "threshold": 30.0,
+                "temperature": 35.5,
+            }]
+        }]
+
+    def test_webhook_failure_is_logged(self):
+        sink = WebhookSink("http://127.0.0.1:9/hook", timeout=0.5)
+        with patch("src.alerts.logger") as mock_logger:
+            sink.deliver([{"rule_id": 1}])
+        mock_logger.error.assert_called_once()
+
+
+class TestAlertEndpoints:
+    """Test cases for the /alerts API"""
+
+    def test_create_and_delete_rule(self, client):
+        with patch.object(main.weather_service, "get_coordinates", return_value=[51.5074, -0.1278]):
+            response = client.post("/alerts", json={"city": "London", "threshold": 0, "direction": "below"})
+        assert response.status_code == 201
+        rule_id = response.json()["rule_id"]
+        assert client.get("/alerts").json()["rules"] >= 1
+
+        assert client.delete(f"/alerts/{rule_id}").status_code == 200
+        assert client.delete(f"/alerts/{rule_id}").status_code == 404
+
+    def test_unknown_city_returns_404(self, client):
+        with patch.object(
+            main.weather_service, "get_coordinates", side_effect=ValueError("City 'Nowhere' not found")
+        ):
+            response = client.post("/alerts", json={"city": "Nowhere", "threshold": 0})
+        assert response.status_code == 404
+
+    def test_invalid_direction_returns_400(self, client):
+        response = client.post("/alerts", json={"city": "London", "threshold": 0, "direction": "up"})
+        assert response.status_code == 400
+
+    def test_other_workers_return_503(self, client):
+        with patch.object(main, "alerts_enabled", False):
+            assert client.post("/alerts", json={"city": "London", "threshold": 0}).status_code == 503
+            assert client.get("/alerts").status_code == 503
+            assert client.delete("/alerts/1").status_code == 503
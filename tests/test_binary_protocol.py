@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the binary protocol used by internal callers
+"""
+import asyncio
+import math
+import struct
+from unittest.mock import patch
+
+import pytest
+
+from src.admission import AdmissionController
+from src.binary_protocol import (
+    STATUS_NOT_FOUND,
+    STATUS_OK,
+    STATUS_OVERLOADED,
+    BinaryProtocolServer,
+    BinaryWeatherClient,
+    ProtocolError,
+    decode_request,
+    decode_response,
+    encode_request,
+    encode_response,
+)
+from src.cache import InProcessCacheBackend
+from src.main import WeatherService, worker_path
+
+
+@pytest.fixture
+def service():
+    """WeatherService with London and Paris already cached"""
+    service = WeatherService(InProcessCacheBackend(), InProcessCacheBackend())
+    service.geocode_cache.set("london", [51.5074, -0.1278], 3600)
+    service.geocode_cache.set("paris", [48.8566, 2.3522], 3600)
+    service.weather_cache.set("51.5074,-0.1278", {"temperature": 15.5}, 600)
+    service.weather_cache.set("48.8566,2.3522", {"temperature": 9.25}, 600)
+    return service
+
+
+def run_with_server(service, admission, path, client_calls):
+    """Start a server, run blocking client calls in a thread, return their result"""
+    async def scenario():
+        server = BinaryProtocolServer(service, admission)
+        await server.start(path)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, client_calls)
+        finally:
+            await server.close()
+
+    return asyncio.run(scenario())
+
+
+class TestCodec:
+    """Test cases for frame encoding"""
+
+    def test_request_round_trip(self):
+        frame = encode_request(["London", "São Paulo"])
+        (length,) = struct.unpack_from("<I", frame)
+        assert length == len(frame) - 4
+        assert decode_request(frame[4:]) == ["London", "São Paulo"]
+
+    def test_response_records_are_fixed_size(self):
+        frame = encode_response([(STATUS_OK, 15.5), (STATUS_NOT_FOUND, float("nan"))])
+        assert len(frame) == 4 + 2 + 2 * 8
+        results = decode_response(frame[4:])
+        assert results[0] == (STATUS_OK, 15.5)
+        assert results[1][0] == STATUS_NOT_FOUND and math.isnan(results[1][1])
+
+    def test_malformed_request_is_rejected(self):
+        with pytest.raises(ProtocolError):
+            decode_request(struct.pack("<H", 2) + b"\x06London")
+
+    def test_long_names_are_rejected(self):
+        with pytest.raises(ProtocolError):
+            encode_request(["x" * 256])
+
+
+class TestCachedTemperatures:
+    """Test cases for the batched cache lookup"""
+
+    def test_returns_only_fully_cached_cities(self, service):
+        temperatures = service.get_cached_temperatures(["London", "PARIS", "Tokyo"])
+        assert temperatures == {"London": 15.5, "PARIS": 9.25}
+
+
+class TestBinaryProtocolServer:
+    """Test cases for serving lookups over a Unix socket"""
+
+    def test_batch_served_from_cache(self, service, tmp_path):
+        path = str(tmp_path / "weather.sock")
+
+        def calls():
+            client = BinaryWeatherClient(path)
+            try:
+                return client.get_temperatures(["London", "Paris"])
+            finally:
+                client.close()
+
+        with patch.object(WeatherService, "get_city_conditions") as mock_conditions:
+            results = run_with_server(service, AdmissionController(), path, calls)
+        assert results == [(STATUS_OK, 15.5), (STATUS_OK, 9.25)]
+        mock_conditions.assert_not_called()
+
+    def test_pipelined_frames_answered_in_order(self, service, tmp_path):
+        path = str(tmp_path / "weather.sock")
+
+        def calls():
+            client = BinaryWeatherClient(path)
+            try:
+                return client.pipeline([["Paris"], ["London", "Paris"], ["London"]])
+            finally:
+                client.close()
+
+        results = run_with_server(service, AdmissionController(), path, calls)
+        assert results == [
+            [(STATUS_OK, 9.25)],
+            [(STATUS_OK, 15.5), (STATUS_OK, 9.25)],
+            [(STATUS_OK, 15.5)],
+        ]
+
+    def test_misses_use_service_and_report_status(self, service, tmp_path):
+        path = str(tmp_path / "weather.sock")
+
+        def conditions(city_name):
+            if city_name == "Tokyo":
+                return {"temperature": 20.0}
+            raise ValueError(f"City '{city_name}' not found")
+
+        def calls():
+            client = BinaryWeatherClient(path)
+            try:
+                return client.get_temperatures(["Tokyo", "Nowhere", "London"])
+            finally:
+                client.close()
+
+        with patch.object(WeatherService, "get_city_conditions", side_effect=conditions):
+            results = run_with_server(service, AdmissionController(), path, calls)
+        assert results[0] == (STATUS_OK, 20.0)
+        assert results[1][0] == STATUS_NOT_FOUND
+        assert results[2] == (STATUS_OK, 15.5)
+
+    def test_misses_shed_when_saturated(self, service, tmp_path):
+        path = str(tmp_path / "weather.sock")
+        admission = AdmissionController(initial_limit=2, max_queue=0)
+        admission.in_flight = 2
+
+        def calls():
+            client = BinaryWeatherClient(path)
+            try:
+                return client.get_temperatures(["Tokyo", "London"])
+            finally:
+                client.close()
+
+        results = run_with_server(service, admission, path, calls)
+        assert results[0][0] == STATUS_OVERLOADED
+        assert results[1] == (STATUS_OK, 15.5)
+
+
+class TestWorkerPaths:
+    """Test cases for per-worker socket and snapshot paths"""
+
+    def test_path_unchanged_without_worker_index(self, monkeypatch):
+        monkeypatch.delenv("WEATHER_WORKER_INDEX", raising=False)
+        assert worker_path("/app/data/weather.sock") == "/app/data/weather.sock"
+
+    def test_each_worker_gets_its_own_path(self, monkeypatch):
+        monkeypatch.setenv("WEATHER_WORKER_INDEX", "1")
+        assert worker_path("/app/data/weather.sock") == "/app/data/weather-1.sock"
+        assert worker_path("/app/data/cache.snapshot") == "/app/data/cache-1.snapshot"
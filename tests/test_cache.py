@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the cache backends using a local Redis-protocol stand-in
+"""
+import socket
+import socketserver
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.cache import (
+    HashRing,
+    InProcessCacheBackend,
+    RedisCacheBackend,
+    RespConnection,
+)
+from src.main import WeatherService
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """Tiny in-memory server speaking enough RESP for the cache backend"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeRedisHandler)
+        self.data = {}
+        self.subscribers = []
+        self.commands = []
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.server_address[1]}"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def disconnect_subscribers(self):
+        """Drop subscriber connections, as a node restart would"""
+        with self.lock:
+            for subscriber in self.subscribers:
+                subscriber.request.shutdown(socket.SHUT_RDWR)
+            self.subscribers.clear()
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        server = self.server
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+            with server.lock:
+                server.commands.append(name)
+                if name == b"GET":
+                    value, expires_at = server.data.get(args[1], (None, 0))
+                    if value is None or expires_at <= time.time():
+                        self.wfile.write(b"$-1\r\n")
+                    else:
+                        self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+                elif name == b"SET":
+                    options = [a.upper() for a in args[3:]]
+                    ttl = int(args[3 + options.index(b"PX") + 1]) / 1000
+                    current = server.data.get(args[1], (None, 0))
+                    if b"NX" in options and current[1] > time.time():
+                        self.wfile.write(b"$-1\r\n")
+                    else:
+                        server.data[args[1]] = (args[2], time.time() + ttl)
+                        self.wfile.write(b"+OK\r\n")
+                elif name == b"EXISTS":
+                    value, expires_at = server.data.get(args[1], (None, 0))
+                    self.wfile.write(b":%d\r\n" % (1 if value is not None and expires_at > time.time() else 0))
+                elif name == b"EVAL":
+                    # Only the compare-and-delete unlock script is supported
+                    key, token = args[3], args[4]
+                    matches = server.data.get(key, (None, 0))[0] == token
+                    if matches:
+                        del server.data[key]
+                    self.wfile.write(b":%d\r\n" % (1 if matches else 0))
+                elif name == b"PTTL":
+                    value, expires_at = server.data.get(args[1], (None, 0))
+                    remaining = int((expires_at - time.time()) * 1000)
+                    self.wfile.write(b":%d\r\n" % (remaining if value is not None and remaining > 0 else -2))
+                elif name == b"DEL":
+                    removed = server.data.pop(args[1], None)
+                    self.wfile.write(b":%d\r\n" % (1 if removed else 0))
+                elif name == b"PUBLISH":
+                    message = RespConnection.encode(b"message", args[1], args[2])
+                    for subscriber in server.subscribers:
+                        subscriber.wfile.write(message)
+                        subscriber.wfile.flush()
+                    self.wfile.write(b":%d\r\n" % len(server.subscribers))
+                elif name == b"SUBSCRIBE":
+                    server.subscribers.append(self)
+                    self.wfile.write(RespConnection.encode(b"subscribe", args[1], b"1"))
+                else:
+                    self.wfile.write(b"-ERR unknown command\r\n")
+            self.wfile.flush()
+
+
+@pytest.fixture
+def redis_servers():
+    """Start two stand-in nodes"""
+    servers = [FakeRedisServer(), FakeRedisServer()]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+class TestInProcessCacheBackend:
+    """Test cases for the in-process backend"""
+
+    def test_set_and_get(self):
+        cache = InProcessCacheBackend()
+        cache.set("london", [51.5, -0.1], 60)
+        assert cache.get("london") == [51.5, -0.1]
+
+    def test_expired_entries_are_dropped(self):
+        cache = InProcessCacheBackend()
+        cache.set("london", 15.2, -1)
+        assert cache.get("london") is None
+        assert len(cache) == 0
+
+    def test_ttl_reports_remaining_time(self):
+        cache = InProcessCacheBackend()
+        cache.set("london", 15.2, 60)
+        assert 59 < cache.ttl("london") <= 60
+        assert cache.ttl("paris") is None
+
+    def test_get_or_load_calls_loader_once(self):
+        cache = InProcessCacheBackend()
+        loader = Mock(return_value=15.2)
+        assert cache.get_or_load("london", loader, 60) == 15.2
+        assert cache.get_or_load("london", loader, 60) == 15.2
+        loader.assert_called_once()
+
+    def test_unlock_only_releases_this_threads_lock(self):
+        cache = InProcessCacheBackend()
+        assert cache.try_lock("london", 0.05)
+        time.sleep(0.1)
+        other = threading.Thread(target=lambda: cache.try_lock("london", 10))
+        other.start()
+        other.join()
+
+        cache.unlock("london")
+        assert not cache.try_lock("london", 10)
+
+    def test_get_or_load_collapses_concurrent_fills(self):
+        cache = InProcessCacheBackend()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.1)
+            return 15.2
+
+        threads = [
+            threading.Thread(target=cache.get_or_load, args=("london", loader, 60))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+
+    def test_failed_load_releases_lock(self):
+        cache = InProcessCacheBackend()
+        with pytest.raises(ValueError):
+            cache.get_or_load("london", Mock(side_effect=ValueError("boom")), 60)
+        assert cache.get_or_load("london", Mock(return_value=1.0), 60) == 1.0
+
+
+class TestHashRing:
+    """Test cases for consistent hashing"""
+
+    def test_keys_spread_across_nodes(self):
+        ring = HashRing(["a:1", "b:2", "c:3"])
+        nodes = {ring.get_node(f"city-{i}") for i in range(200)}
+        assert nodes == {"a:1", "b:2", "c:3"}
+
+    def test_removing_node_only_moves_its_keys(self):
+        ring = HashRing(["a:1", "b:2", "c:3"])
+        before = {f"city-{i}": ring.get_node(f"city-{i}") for i in range(500)}
+        ring.remove_node("c:3")
+        for key, node in before.items():
+            if node != "c:3":
+                assert ring.get_node(key) == node
+
+
+class TestRedisCacheBackend:
+    """Test cases for the shared backend against stand-in nodes"""
+
+    def test_values_shared_between_replicas(self, redis_servers):
+        nodes = [server.address for server in redis_servers]
+        replica_a = RedisCacheBackend(nodes, namespace="weather")
+        replica_b = RedisCacheBackend(nodes, namespace="weather")
+        loader = Mock(return_value=15.2)
+
+        assert replica_a.get_or_load("51.5,-0.1", loader, 60) == 15.2
+        assert replica_b.get_or_load("51.5,-0.1", loader, 60) == 15.2
+        loader.assert_called_once()
+
+    def test_get_many_pipelines_per_node(self, redis_servers):
+        nodes = [server.address for server in redis_servers]
+        writer = RedisCacheBackend(nodes)
+        for i in range(20):
+            writer.set(f"city-{i}", i, 60)
+
+        reader = RedisCacheBackend(nodes)
+        for server in redis_servers:
+            server.commands.clear()
+        values = reader.get_many([f"city-{i}" for i in range(20)] + ["missing"])
+
+        assert values == {f"city-{i}": i for i in range(20)}
+        assert sum(len(server.commands) for server in redis_servers) == 21
+
+    def test_ttl_read_from_shared_store(self, redis_servers):
+        cache = RedisCacheBackend([server.address for server in redis_servers])
+        cache.set("london", 15.2, 60)
+        assert 59 < cache.ttl("london") <= 60
+        assert cache.ttl("paris") is None
+
+    def test_l1_serves_repeat_reads(self, redis_servers):
+        cache = RedisCacheBackend([redis_servers[0].address])
+        cache.set("london", 15.2, 60)
+        redis_servers[0].commands.clear()
+        assert cache.get("london") == 15.2
+        assert redis_servers[0].commands == []
+
+    def test_delete_invalidates_other_replicas_l1(self, redis_servers):
+        nodes = [server.address for server in redis_servers]
+        replica_a = RedisCacheBackend(nodes)
+        replica_b = RedisCacheBackend(nodes)
+        replica_b.start_invalidation_listener()
+        time.sleep(0.1)
+
+        replica_a.set("london", 15.2, 60)
+        assert replica_b.get("london") == 15.2
+        replica_a.delete("london")
+
+        deadline = time.time() + 2
+        while replica_b.l1.get("london") is not None and time.time() < deadline:
+            time.sleep(0.01)
+        assert replica_b.get("london") is None
+
+    def test_overwrite_invalidates_other_replicas_l1(self, redis_servers):
+        nodes = [server.address for server in redis_servers]
+        replica_a = RedisCacheBackend(nodes)
+        replica_b = RedisCacheBackend(nodes)
+        replica_b.start_invalidation_listener()
+        time.sleep(0.1)
+
+        replica_a.set("london", 15.2, 60)
+        assert replica_b.get("london") == 15.2
+        replica_a.set("london", 16.0, 60)
+
+        deadline = time.time() + 2
+        while replica_b.l1.get("london") is not None and time.time() < deadline:
+            time.sleep(0.01)
+        assert replica_b.get("london") == 16.0
+
+    def test_listener_reconnects_after_node_restart(self, redis_servers):
+        server = redis_servers[0]
+        replica_a = RedisCacheBackend([server.address])
+        replica_b = RedisCacheBackend([server.address])
+        replica_b.listener_min_backoff = 0.05
+        replica_b.start_invalidation_listener()
+        time.sleep(0.1)
+
+        server.disconnect_subscribers()
+        deadline = time.time() + 2
+        while not server.subscribers and time.time() < deadline:
+            time.sleep(0.01)
+        assert server.subscribers
+
+        replica_a.set("london", 15.2, 60)
+        assert replica_b.get("london") == 15.2
+        replica_a.delete("london")
+        deadline = time.time() + 2
+        while replica_b.l1.get("london") is not None and time.time() < deadline:
+            time.sleep(0.01)
+        assert replica_b.get("london") is None
+
+    def test_unlock_only_releases_own_lock(self, redis_servers):
+        nodes = [server.address for server in redis_servers]
+        replica_a = RedisCacheBackend(nodes)
+        replica_b = RedisCacheBackend(nodes)
+        assert replica_a.try_lock("london", 0.05)
+        time.sleep(0.1)
+        # A's lock expired mid-load and B took it over
+        assert replica_b.try_lock("london", 10)
+
+        replica_a.unlock("london")
+        assert not replica_a.try_lock("london", 10)
+        replica_b.unlock("london")
+        assert replica_a.try_lock("london", 10)
+
+    def test_unlock_only_releases_this_threads_lock(self, redis_servers):
+        cache = RedisCacheBackend([server.address for server in redis_servers])
+        assert cache.try_lock("london", 0.05)
+        time.sleep(0.1)
+        # Another thread of the same replica takes over the expired lock
+        other = threading.Thread(target=lambda: cache.try_lock("london", 10))
+        other.start()
+        other.join()
+
+        cache.unlock("london")
+        assert not cache.try_lock("london", 10)
+
+    def test_unreachable_node_degrades_to_local_fill(self):
+        cache = RedisCacheBackend(["127.0.0.1:1"], timeout=0.1)
+        assert cache.get_or_load("london", Mock(return_value=15.2), 60) == 15.2
+        assert cache.get("london") == 15.2
+
+
+class TestWeatherServiceCaching:
+    """Test cases for caching in the WeatherService"""
+
+    @patch('src.main.Nominatim')
+    def test_geocode_cached_across_spellings(self, mock_nominatim):
+        mock_location = Mock(latitude=51.5074, longitude=-0.1278)
+        mock_nominatim.return_value.geocode.return_value = mock_location
+
+        service = WeatherService(InProcessCacheBackend(), InProcessCacheBackend())
+        assert service.get_coordinates("London") == (51.5074, -0.1278)
+        assert service.get_coordinates("  london ") == (51.5074, -0.1278)
+        mock_nominatim.return_value.geocode.assert_called_once()
+
+    @patch('src.main.requests.get')
+    def test_weather_cached_per_location(self, mock_get):
+        mock_get.return_value.json.return_value = {"current_weather": {"temperature": 15.2}}
+
+        service = WeatherService(InProcessCacheBackend(), InProcessCacheBackend())
+        assert service.get_weather(51.5074, -0.1278) == 15.2
+        assert service.get_weather(51.5074, -0.1278) == 15.2
+        mock_get.assert_called_once()
+
+    @patch('src.main.requests.get')
+    @patch('src.main.Nominatim')
+    def test_each_lookup_counted_once_in_stats(self, mock_nominatim, mock_get):
+        mock_nominatim.return_value.geocode.return_value = Mock(latitude=51.5074, longitude=-0.1278)
+        mock_get.return_value.json.return_value = {"current_weather": {"temperature": 15.2}}
+        service = WeatherService(InProcessCacheBackend(), InProcessCacheBackend())
+        geocode, weather = service.geocode_cache._store, service.weather_cache._store
+
+        # A request checks is_cached before looking the city up
+        for _ in range(2):
+            service.is_cached("London")
+            service.get_weather(*service.get_coordinates("London"))
+
+        assert (geocode.hits, geocode.misses) == (1, 1)
+        assert (weather.hits, weather.misses) == (1, 1)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Unit tests for current-conditions records and their projections
+"""
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.cache import InProcessCacheBackend
+from src.conditions import canonical_record, parse_fields, parse_units, project
+from src.main import WeatherService, app
+
+RECORD = {
+    "temperature": 15.0,
+    "windspeed": 16.09344,
+    "winddirection": 270,
+    "weathercode": 3,
+    "is_day": 1,
+    "time": "2024-01-01T12:00",
+}
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the FastAPI app"""
+    with TestClient(app) as client:
+        yield client
+
+
+class TestProjections:
+    """Test cases for pure projections over a cached record"""
+
+    def test_canonical_record_drops_unknown_fields(self):
+        record = canonical_record(dict(RECORD, interval=900))
+        assert record == RECORD
+
+    def test_metric_projection_is_identity(self):
+        assert project(RECORD, ["temperature", "windspeed"]) == {
+            "temperature": 15.0,
+            "windspeed": 16.09344,
+        }
+
+    def test_imperial_projection_converts_units(self):
+        projected = project(RECORD, ["temperature", "windspeed", "weathercode"], "imperial")
+        assert projected == {"temperature": 59.0, "windspeed": 10.0, "weathercode": 3}
+
+    def test_parse_fields_defaults_to_all(self):
+        assert parse_fields(None) == list(RECORD)
+
+    def test_parse_fields_rejects_unknown(self):
+        with pytest.raises(ValueError, match="Unknown field"):
+            parse_fields("temperature,humidity")
+
+    def test_parse_units_rejects_unknown(self):
+        with pytest.raises(ValueError, match="Unknown units"):
+            parse_units("kelvin")
+
+
+class TestConditionsCaching:
+    """Test cases for caching the full record once per location"""
+
+    @patch('src.main.requests.get')
+    def test_record_fetched_once_for_all_projections(self, mock_get):
+        mock_get.return_value.json.return_value = {"current_weather": RECORD}
+        service = WeatherService(InProcessCacheBackend(), InProcessCacheBackend())
+
+        assert service.get_weather(51.5074, -0.1278) == 15.0
+        record = service.get_current_conditions(51.5074, -0.1278)
+        assert project(record, ["windspeed"], "imperial") == {"windspeed": 10.0}
+        mock_get.assert_called_once()
+
+
+class TestConditionsEndpoint:
+    """Test cases for ?fields= and ?units= on /weather"""
+
+    @patch.object(WeatherService, 'get_city_conditions', return_value=RECORD)
+    def test_fields_and_units(self, mock_conditions, client):
+        response = client.get("/weather/London?fields=temperature,windspeed&units=imperial")
+        assert response.status_code == 200
+        assert response.json() == {
+            "city": "London",
+            "units": {"temperature": "fahrenheit", "windspeed": "mph"},
+            "current": {"temperature": 59.0, "windspeed": 10.0},
+        }
+
+    def test_invalid_units_return_400(self, client):
+        response = client.get("/weather/London?units=kelvin")
+        assert response.status_code == 400
+
+    @patch.object(WeatherService, 'get_city_conditions')
+    def test_unknown_city_returns_404(self, mock_conditions, client):
+        mock_conditions.side_effect = ValueError("City 'Nowhere' not found")
+        response = client.get("/weather/Nowhere?fields=temperature")
+        assert response.status_code == 404
+        assert "Error getting weather" in response.json()["detail"]
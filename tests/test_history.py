@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the observation history store
+"""
+import os
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main
+from src.cache import InProcessCacheBackend
+from src.history import HistoryStore, _map, downsample, parse_time
+from src.main import WeatherService
+
+DAY = 86400
+# 2024-01-01T00:00:00Z
+START = 1704067200.0
+
+
+@pytest.fixture
+def store(tmp_path):
+    """History store in a temporary directory"""
+    return HistoryStore(str(tmp_path / "history"))
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the FastAPI app"""
+    with TestClient(main.app) as client:
+        yield client
+
+
+class TestHistoryStore:
+    """Test cases for appending and querying observations"""
+
+    def test_partitioned_by_location_and_day(self, store):
+        store.append(51.5074, -0.1278, START + 60, 5.0)
+        store.append(51.5074, -0.1278, START + DAY + 60, 6.0)
+        store.append(48.8566, 2.3522, START + 60, 7.0)
+
+        assert sorted(os.listdir(store.root)) == ["48.8566,2.3522", "51.5074,-0.1278"]
+        assert sorted(os.listdir(os.path.join(store.root, "51.5074,-0.1278"))) == [
+            "2024-01-01", "2024-01-02"
+        ]
+        partition = os.path.join(store.root, "51.5074,-0.1278", "2024-01-01")
+        assert os.path.getsize(os.path.join(partition, "time.f8")) == 8
+        assert os.path.getsize(os.path.join(partition, "temperature.f4")) == 4
+
+    def test_range_query_spans_partitions(self, store):
+        for hour in range(48):
+            store.append(51.5074, -0.1278, START + hour * 3600, float(hour))
+
+        times, temperatures = store.query(51.5074, -0.1278, START + 20 * 3600, START + 30 * 3600)
+
+        assert temperatures.tolist() == [float(hour) for hour in range(20, 31)]
+        assert times[0] == START + 20 * 3600
+
+    def test_query_opens_only_existing_partitions(self, store):
+        store.append(51.5074, -0.1278, START + 10 * DAY, 5.0)
+        with patch("src.history._map", wraps=_map) as mapped:
+            times, _ = store.query(51.5074, -0.1278, START, START + 365 * DAY)
+        assert list(times) == [START + 10 * DAY]
+        assert mapped.call_count == 2
+
+    def test_unknown_location_is_empty(self, store):
+        times, temperatures = store.query(0.0, 0.0, START, START + DAY)
+        assert len(times) == len(temperatures) == 0
+
+    def test_query_is_memory_mapped(self, store):
+        store.append(51.5074, -0.1278, START, 1.0)
+        with patch("src.history.np.memmap", wraps=np.memmap) as mock_memmap:
+            store.query(51.5074, -0.1278, START, START + 60)
+        assert mock_memmap.call_count == 2
+
+    def test_torn_append_is_ignored(self, store):
+        store.append(51.5074, -0.1278, START, 1.0)
+        partition = os.path.join(store.root, "51.5074,-0.1278", "2024-01-01")
+        with open(os.path.join(partition, "temperature.f4"), "ab") as f:
+            f.write(np.float32(2.0).tobytes())
+
+        _, temperatures = store.query(51.5074, -0.1278, START, START + DAY)
+        assert temperatures.tolist() == [1.0]
+
+        # Later rows stay paired with their own temperature
+        store.append(51.5074, -0.1278, START + 60, 3.0)
+        times, temperatures = store.query(51.5074, -0.1278, START, START + DAY)
+        assert times.tolist() == [START, START + 60]
+        assert temperatures.tolist() == [1.0, 3.0]
+
+
+class TestDownsample:
+    """Test cases for per-bucket aggregation"""
+
+    def test_min_max_avg_per_bucket(self):
+        times = START + np.array([0, 600, 1200, 3600, 4200])
+        temperatures = np.array([1.0, 3.0, 2.0, 10.0, 20.0])
+
+        buckets = downsample(times, temperatures, START, 3600)
+
+        assert buckets == [
+            {"start": "2024-01-01T00:00:00+00:00", "min": 1.0, "max": 3.0, "avg": 2.0, "count": 3},
+            {"start": "2024-01-01T01:00:00+00:00", "min": 10.0, "max": 20.0, "avg": 15.0, "count": 2},
+        ]
+
+    def test_empty_range(self):
+        assert downsample(np.empty(0), np.empty(0), START, 3600) == []
+
+    def test_parse_time(self):
+        assert parse_time("2024-01-01T00:00:00Z", 0) == START
+        assert parse_time("2024-01-01T00:00", 0) == START
+        assert parse_time(str(START), 0) == START
+        assert parse_time(None, 5.0) == 5.0
+        with pytest.raises(ValueError):
+            parse_time("yesterday", 0)
+
+    def test_parse_time_rejects_out_of_range(self):
+        for value in ("nan", "inf", "-inf", "-1e12", "1e20"):
+            with pytest.raises(ValueError):
+                parse_time(value, 0)
+
+
+class TestCompaction:
+    """Test cases for background compaction"""
+
+    def test_out_of_order_partitions_are_sorted(self, store):
+        for offset, temperature in ((300, 3.0), (100, 1.0), (200, 2.0)):
+            store.append(51.5074, -0.1278, START + offset, temperature)
+
+        result = store.compact(now=START + 2 * DAY)
+
+        assert result["sorted"] == 1
+        _, temperatures = store.query(51.5074, -0.1278, START, START + DAY)
+        assert temperatures.tolist() == [1.0, 2.0, 3.0]
+
+    def test_old_partitions_expire(self, tmp_path):
+        store = HistoryStore(str(tmp_path / "history"), retention_days=7)
+        store.append(51.5074, -0.1278, START, 1.0)
+        store.append(51.5074, -0.1278, START + 10 * DAY, 2.0)
+
+        store.compact(now=START + 10 * DAY)
+
+        assert os.listdir(os.path.join(store.root, "51.5074,-0.1278")) == ["2024-01-11"]
+
+    def test_oldest_days_dropped_over_budget(self, tmp_path):
+        store = HistoryStore(str(tmp_path / "history"), max_bytes=12 * 20)
+        for day in range(5):
+            for i in range(10):
+                store.append(51.5074, -0.1278, START + day * DAY + i, float(i))
+
+        result = store.compact(now=START + 4 * DAY)
+
+        assert result["bytes"] <= 12 * 20
+        assert sorted(os.listdir(os.path.join(store.root, "51.5074,-0.1278"))) == [
+            "2024-01-04", "2024-01-05"
+        ]
+
+
+class TestHistoryRecording:
+    """Test cases for recording fetched temperatures"""
+
+    def test_fetched_temperatures_are_recorded(self, store):
+        providers = Mock()
+        providers.fetch_current.return_value = {"temperature": 12.5, "time": "2024-01-01T12:00"}
+        service = WeatherService(
+            InProcessCacheBackend(), InProcessCacheBackend(), providers=providers, history=store
+        )
+
+        service.get_current_conditions(51.5074, -0.1278)
+        service.get_current_conditions(51.5074, -0.1278)  # served from cache
+
+        _, temperatures = store.query(51.5074, -0.1278, 0, 4e9)
+        assert temperatures.tolist() == [12.5]
+
+
+class TestHistoryEndpoint:
+    """Test cases for /weather/{city_name}/history"""
+
+    @pytest.fixture
+    def history(self, store):
+        for minute in range(0, 120, 10):
+            store.append(51.5074, -0.1278, START + minute * 60, float(minute))
+        with patch.object(main.weather_service, "history", store), \
+                patch.object(main.weather_service, "get_coordinates", return_value=(51.5074, -0.1278)):
+            yield store
+
+    def test_raw_observations(self, client, history):
+        response = client.get(
+            "/weather/London/history",
+            params={"from": "2024-01-01T00:00:00Z", "to": "2024-01-01T00:30:00Z"},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [o["temperature"] for o in data["observations"]] == [0.0, 10.0, 20.0, 30.0]
+        assert data["observations"][0]["time"] == "2024-01-01T00:00:00+00:00"
+
+    def test_downsampled(self, client, history):
+        response = client.get(
+            "/weather/London/history",
+            params={"from": "2024-01-01T00:00:00Z", "to": "2024-01-01T02:00:00Z", "bucket": 3600},
+        )
+        assert response.status_code == 200
+        buckets = response.json()["buckets"]
+        assert [(b["min"], b["max"], b["avg"], b["count"]) for b in buckets] == [
+            (0.0, 50.0, 25.0, 6), (60.0, 110.0, 85.0, 6)
+        ]
+
+    def test_invalid_range_returns_400(self, client, history):
+        response = client.get("/weather/London/history", params={"from": "soon"})
+        assert response.status_code == 400
+        response = client.get(
+            "/weather/London/history",
+            params={"from": "2024-01-02T00:00:00Z", "to": "2024-01-01T00:00:00Z"},
+        )
+        assert response.status_code == 400
+
+    def test_non_finite_time_returns_400(self, client, history):
+        for value in ("nan", "inf", "-1e12"):
+            response = client.get("/weather/London/history", params={"from": value})
+            assert response.status_code == 400
+
+    def test_range_over_max_span_returns_400(self, client, history):
+        response = client.get(
+            "/weather/London/history",
+            params={"from": "2020-01-01T00:00:00Z", "to": "2024-01-01T00:00:00Z"},
+        )
+        assert response.status_code == 400
+
+    def test_disabled_returns_503(self, client):
+        with patch.object(main.weather_service, "history", None):
+            response = client.get("/weather/London/history")
+        assert response.status_code == 503
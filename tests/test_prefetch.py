@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Unit tests for popularity-driven prefetch
+"""
+import random
+from unittest.mock import Mock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main
+from src.cache import InProcessCacheBackend
+from src.main import WeatherService
+from src.prefetch import HeavyHitters, PrefetchScheduler
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the FastAPI app"""
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def service():
+    """WeatherService with three geocoded cities and a stub provider"""
+    providers = Mock()
+    providers.fetch_current.return_value = {"temperature": 12.5}
+    service = WeatherService(InProcessCacheBackend(), InProcessCacheBackend(), providers=providers)
+    for i, city in enumerate(["london", "paris", "tokyo"]):
+        service.geocode_cache.set(city, [float(i), float(i)], 3600)
+    return service
+
+
+class TestHeavyHitters:
+    """Test cases for the count-min sketch and top-k table"""
+
+    def test_finds_heavy_hitters_in_skewed_traffic(self):
+        hitters = HeavyHitters(k=10, width=1024)
+        rng = random.Random(0)
+        hot = [f"hot-{i}" for i in range(5)]
+        for _ in range(20_000):
+            if rng.random() < 0.5:
+                hitters.record(rng.choice(hot))
+            else:
+                hitters.record(f"cold-{rng.randrange(50_000)}")
+
+        top = [key for key, _ in hitters.heavy_hitters(5)]
+        assert sorted(top) == hot
+
+    def test_table_holds_at_most_k_keys(self):
+        hitters = HeavyHitters(k=3)
+        for i in range(100):
+            hitters.record(f"city-{i}")
+        assert len(hitters.heavy_hitters()) == 3
+
+    def test_estimate_never_undercounts(self):
+        hitters = HeavyHitters(width=64)
+        for i in range(500):
+            hitters.record(f"city-{i % 50}")
+        assert all(hitters.estimate(f"city-{i}") >= 10 for i in range(50))
+
+    def test_rows_use_independent_counters(self):
+        hitters = HeavyHitters()
+        indexes = [hitters._indexes(f"city-{i}") for i in range(1000)]
+        for row in range(hitters.depth):
+            assert len({key_indexes[row] for key_indexes in indexes}) > 800
+
+    def test_counts_decay(self):
+        hitters = HeavyHitters(decay_every=100)
+        for _ in range(99):
+            hitters.record("london")
+        hitters.record("paris")
+        assert hitters.estimate("london") == 49
+        assert dict(hitters.heavy_hitters())["london"] == 49
+
+
+class TestPrefetchScheduler:
+    """Test cases for refreshing heavy hitters ahead of expiry"""
+
+    def test_refreshes_entries_about_to_expire(self, service):
+        hitters = HeavyHitters()
+        for city in ("london", "paris", "tokyo"):
+            hitters.record(city)
+        service.weather_cache.set(service.weather_key(0.0, 0.0), {"temperature": 1.0}, 10)
+        service.weather_cache.set(service.weather_key(1.0, 1.0), {"temperature": 1.0}, 500)
+        scheduler = PrefetchScheduler(service, hitters, lead=30)
+
+        assert scheduler.run_once() == 2
+        # London was about to expire and Tokyo was missing; Paris is left alone
+        assert service.weather_cache.ttl(service.weather_key(0.0, 0.0)) > 500
+        assert service.weather_cache.ttl(service.weather_key(2.0, 2.0)) > 500
+        assert service.weather_cache.get(service.weather_key(1.0, 1.0)) == {"temperature": 1.0}
+
+    def test_budget_limits_upstream_calls(self, service):
+        hitters = HeavyHitters()
+        for count, city in enumerate(("london", "paris", "tokyo")):
+            for _ in range(count + 1):
+                hitters.record(city)
+        scheduler = PrefetchScheduler(service, hitters, budget_per_minute=2)
+
+        assert scheduler.run_once() == 2
+        assert service.providers.fetch_current.call_count == 2
+        assert scheduler.deferred == 1
+        # The most popular cities get the budget first
+        assert service.weather_cache.get(service.weather_key(2.0, 2.0)) is not None
+        assert service.weather_cache.get(service.weather_key(0.0, 0.0)) is None
+
+    def test_cities_without_coordinates_are_skipped(self, service):
+        hitters = HeavyHitters()
+        hitters.record("nowhere")
+        assert PrefetchScheduler(service, hitters).due() == []
+
+    def test_failures_are_counted(self, service):
+        hitters = HeavyHitters()
+        hitters.record("london")
+        service.providers.fetch_current.side_effect = ValueError("Temperature data not available")
+        scheduler = PrefetchScheduler(service, hitters)
+
+        assert scheduler.run_once() == 0
+        assert scheduler.failed == 1
+
+    def test_refresh_skipped_while_another_fill_holds_the_lock(self, service):
+        key = service.weather_key(0.0, 0.0)
+        assert service.weather_cache.try_lock(key, 10)
+        assert not service.refresh_conditions(0.0, 0.0)
+        service.providers.fetch_current.assert_not_called()
+
+
+class TestPopularityTracking:
+    """Test cases for recording popularity in the /weather route"""
+
+    def test_requests_are_counted_by_normalized_name(self, client):
+        with patch.object(main, "popularity", HeavyHitters()) as popularity, \
+                patch.object(main.weather_service, "get_city_temperature", return_value="15.2 Celsius now in London"):
+            client.get("/weather/London")
+            client.get("/weather/LONDON")
+        assert popularity.estimate("london") == 2
+
+    def test_prefetch_reported_in_cache_stats(self, client):
+        data = client.get("/cache/stats").json()
+        assert "budget_per_minute" in data["prefetch"]
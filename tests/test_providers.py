@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Unit tests for weather providers and latency-based routing
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from src import main
+from src.cache import InProcessCacheBackend
+from src.main import WeatherService
+from src.providers import OpenMeteoProvider, ProviderRouter, WeatherProvider
+
+
+class StubProvider(WeatherProvider):
+    """Local provider with injected latency and failures"""
+
+    def __init__(self, name, temperature, latency=0.0, error=None):
+        self.name = name
+        self.temperature = temperature
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+
+    def fetch_current(self, latitude, longitude):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return {"temperature": self.temperature}
+
+
+class TestOpenMeteoProvider:
+    """Test cases for the Open-Meteo provider"""
+
+    @patch('src.providers.requests.get')
+    def test_fetch_current_returns_record(self, mock_get):
+        mock_get.return_value.json.return_value = {
+            "current_weather": {"temperature": 15.2, "windspeed": 10.0}
+        }
+        provider = OpenMeteoProvider()
+        record = provider.fetch_current(51.5074, -0.1278)
+        assert record == {"temperature": 15.2, "windspeed": 10.0}
+
+    @patch('src.providers.requests.get')
+    def test_missing_temperature_raises(self, mock_get):
+        mock_get.return_value.json.return_value = {"current_weather": {}}
+        with pytest.raises(ValueError, match="Temperature data not available"):
+            OpenMeteoProvider().fetch_current(51.5074, -0.1278)
+
+
+class TestProviderRouter:
+    """Test cases for routing between providers"""
+
+    def test_routes_to_fastest_provider(self):
+        slow = StubProvider("slow", 1.0, latency=0.05)
+        fast = StubProvider("fast", 2.0, latency=0.0)
+        router = ProviderRouter([slow, fast])
+
+        # Warm up both providers' latency estimates
+        router.fetch_current(0, 0)
+        router.fetch_current(0, 0)
+        slow.calls = fast.calls = 0
+
+        for _ in range(5):
+            assert router.fetch_current(0, 0) == {"temperature": 2.0}
+        assert fast.calls == 5
+        assert slow.calls == 0
+
+    def test_falls_back_on_failure(self):
+        broken = StubProvider("broken", 1.0, error=requests.ConnectionError("down"))
+        backup = StubProvider("backup", 2.0)
+        router = ProviderRouter([broken, backup])
+
+        assert router.fetch_current(0, 0) == {"temperature": 2.0}
+        assert router.stats["broken"].error_rate > 0
+
+    def test_unhealthy_provider_is_skipped(self):
+        broken = StubProvider("broken", 1.0, error=requests.ConnectionError("down"))
+        backup = StubProvider("backup", 2.0, latency=0.01)
+        router = ProviderRouter([broken, backup], error_threshold=0.3)
+
+        for _ in range(5):
+            router.fetch_current(0, 0)
+        broken.calls = 0
+        router.fetch_current(0, 0)
+
+        assert not router.is_healthy(broken)
+        assert broken.calls == 0
+        assert router.ranked()[0] is backup
+
+    def test_all_providers_failing_raises_last_error(self):
+        router = ProviderRouter([
+            StubProvider("a", 1.0, error=requests.ConnectionError("a down")),
+            StubProvider("b", 1.0, error=requests.ConnectionError("b down")),
+        ])
+        with pytest.raises(requests.ConnectionError, match="b down"):
+            router.fetch_current(0, 0)
+
+    def test_hedging_races_second_provider_for_tail(self):
+        stalled = StubProvider("stalled", 1.0, latency=0.5)
+        quick = StubProvider("quick", 2.0, latency=0.01)
+        router = ProviderRouter([stalled, quick], hedge_after=0.05)
+        router.stats["stalled"].latency = 0.001  # looks fastest on paper
+        router.stats["quick"].latency = 0.002
+
+        start = time.perf_counter()
+        assert router.fetch_current(0, 0) == {"temperature": 2.0}
+        assert time.perf_counter() - start < 0.4
+        assert stalled.calls == 1 and quick.calls == 1
+
+    def test_hedging_does_not_limit_concurrency(self):
+        primary = StubProvider("primary", 1.0, latency=0.2)
+        backup = StubProvider("backup", 2.0)
+        router = ProviderRouter([primary, backup], hedge_after=0.3)
+        router.stats["backup"].latency = 1.0
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=32) as callers:
+            results = list(callers.map(lambda _: router.fetch_current(0, 0), range(32)))
+        assert time.perf_counter() - start < 0.35
+        assert results == [{"temperature": 1.0}] * 32
+        assert backup.calls == 0
+
+    def test_summary_reports_rolling_stats(self):
+        fast = StubProvider("fast", 10.0)
+        broken = StubProvider("broken", 0, error=requests.ConnectionError("down"))
+        router = ProviderRouter([broken, fast], cooldown=30)
+        for _ in range(3):
+            router.fetch_current(0.0, 0.0)
+
+        summary = router.summary()
+
+        assert summary["fast"]["requests"] == 3
+        assert summary["fast"]["error_rate"] == 0.0
+        assert summary["fast"]["latency_ms"] is not None
+        assert summary["fast"]["healthy"]
+        assert summary["broken"]["requests"] >= 1
+        assert summary["broken"]["error_rate"] > 0.0
+
+    def test_requires_a_provider(self):
+        with pytest.raises(ValueError):
+            ProviderRouter([])
+
+
+class TestProviderHealth:
+    """Test cases for reporting provider stats"""
+
+    def test_health_reports_provider_stats(self):
+        router = ProviderRouter([StubProvider("stub", 21.5)])
+        router.fetch_current(0.0, 0.0)
+        with patch.object(main.weather_service, "providers", router), \
+                TestClient(main.app) as client:
+            data = client.get("/health").json()
+        assert data["providers"]["stub"]["requests"] == 1
+        assert "latency_ms" in data["providers"]["stub"]
+
+
+class TestWeatherServiceProviders:
+    """Test cases for provider use inside WeatherService"""
+
+    def test_get_weather_uses_router(self):
+        router = ProviderRouter([StubProvider("stub", 21.5)])
+        service = WeatherService(InProcessCacheBackend(), InProcessCacheBackend(), router)
+        assert service.get_weather(51.5074, -0.1278) == 21.5
+
+    def test_provider_errors_are_wrapped(self):
+        router = ProviderRouter([
+            StubProvider("stub", 0, error=requests.ConnectionError("down"))
+        ])
+        service = WeatherService(InProcessCacheBackend(), InProcessCacheBackend(), router)
+        with pytest.raises(ValueError, match="Error fetching weather data"):
+            service.get_weather(51.5074, -0.1278)
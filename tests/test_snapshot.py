@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Unit tests for cache snapshots and warm restore
+"""
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main
+from src.cache import InProcessCacheBackend
+from src.snapshot import CacheSnapshotter, SnapshotError
+
+
+@pytest.fixture
+def caches():
+    """Geocode and weather caches with a few entries"""
+    geocode = InProcessCacheBackend()
+    weather = InProcessCacheBackend()
+    geocode.set("london", [51.5074, -0.1278], 3600)
+    geocode.set("paris", [48.8566, 2.3522], 3600)
+    weather.set("51.5074,-0.1278", {"temperature": 15.2, "windspeed": 10.0}, 600)
+    return {"geocode": geocode, "weather": weather}
+
+
+class TestCacheSnapshotter:
+    """Test cases for saving and restoring snapshots"""
+
+    def test_round_trip(self, tmp_path, caches):
+        path = str(tmp_path / "cache.snapshot")
+        CacheSnapshotter(path, caches).save()
+
+        fresh = {"geocode": InProcessCacheBackend(), "weather": InProcessCacheBackend()}
+        restored, skipped = CacheSnapshotter(path, fresh).restore()
+
+        assert (restored, skipped) == (3, 0)
+        assert fresh["geocode"].get("paris") == [48.8566, 2.3522]
+        assert fresh["weather"].get("51.5074,-0.1278")["temperature"] == 15.2
+
+    def test_expired_entries_are_discarded(self, tmp_path, caches):
+        path = str(tmp_path / "cache.snapshot")
+        caches["weather"].set("short-lived", {"temperature": 1.0}, 0.05)
+        CacheSnapshotter(path, caches).save()
+        time.sleep(0.1)
+
+        fresh = {"geocode": InProcessCacheBackend(), "weather": InProcessCacheBackend()}
+        restored, skipped = CacheSnapshotter(path, fresh).restore()
+
+        assert (restored, skipped) == (3, 1)
+        assert fresh["weather"].get("short-lived") is None
+
+    def test_restore_time_is_bounded(self, tmp_path, caches):
+        path = str(tmp_path / "cache.snapshot")
+        CacheSnapshotter(path, caches).save()
+
+        fresh = {"geocode": InProcessCacheBackend(), "weather": InProcessCacheBackend()}
+        restored, skipped = CacheSnapshotter(path, fresh, max_restore_seconds=-1).restore()
+
+        assert (restored, skipped) == (0, 3)
+
+    def test_deadline_covers_reading_the_file(self, tmp_path, caches):
+        path = str(tmp_path / "cache.snapshot")
+        CacheSnapshotter(path, caches).save()
+
+        fresh = {"geocode": InProcessCacheBackend(), "weather": InProcessCacheBackend()}
+        snapshotter = CacheSnapshotter(path, fresh, max_restore_seconds=0.05)
+        decode = CacheSnapshotter.decode_payload
+
+        def slow_decode(data, max_bytes=None):
+            time.sleep(0.1)
+            return decode(data, max_bytes)
+
+        with patch.object(CacheSnapshotter, "decode_payload", side_effect=slow_decode):
+            assert snapshotter.restore() == (0, 3)
+
+    def test_payload_capped_on_save(self, tmp_path, caches):
+        path = str(tmp_path / "cache.snapshot")
+        full = len(CacheSnapshotter.decode_payload(CacheSnapshotter(path, caches).encode()))
+        CacheSnapshotter(path, caches, max_bytes=full - 1).save()
+
+        fresh = {"geocode": InProcessCacheBackend(), "weather": InProcessCacheBackend()}
+        restored, skipped = CacheSnapshotter(path, fresh).restore()
+        assert (restored, skipped) == (2, 0)
+
+    def test_oversized_snapshot_is_rejected(self, tmp_path, caches):
+        path = str(tmp_path / "cache.snapshot")
+        CacheSnapshotter(path, caches).save()
+        with pytest.raises(SnapshotError):
+            CacheSnapshotter(path, caches, max_bytes=10).restore()
+
+    def test_save_is_atomic(self, tmp_path, caches):
+        path = str(tmp_path / "cache.snapshot")
+        snapshotter = CacheSnapshotter(path, caches)
+        snapshotter.save()
+        with patch("src.snapshot.os.replace", side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                snapshotter.save()
+
+        assert os.listdir(tmp_path) == ["cache.snapshot"]
+        fresh = {"geocode": InProcessCacheBackend(), "weather": InProcessCacheBackend()}
+        assert CacheSnapshotter(path, fresh).restore() == (3, 0)
+
+    def test_corrupt_snapshot_is_rejected(self, tmp_path, caches):
+        path = str(tmp_path / "cache.snapshot")
+        snapshotter = CacheSnapshotter(path, caches)
+        data = bytearray(snapshotter.encode())
+        data[-3] ^= 0xFF
+        with open(path, "wb") as f:
+            f.write(bytes(data))
+
+        with pytest.raises(SnapshotError):
+            snapshotter.restore()
+
+    def test_wrong_magic_is_rejected(self):
+        with pytest.raises(SnapshotError, match="Not a cache snapshot"):
+            CacheSnapshotter.decode_payload(b"JUNK" + b"\0" * 20)
+
+
+class TestLifespanSnapshots:
+    """Test cases for restore on startup and save on shutdown"""
+
+    def test_restore_on_startup_and_save_on_shutdown(self, tmp_path, caches, monkeypatch):
+        path = str(tmp_path / "cache.snapshot")
+        CacheSnapshotter(path, caches).save()
+        monkeypatch.setenv("WEATHER_CACHE_SNAPSHOT_PATH", path)
+
+        geocode, weather = InProcessCacheBackend(), InProcessCacheBackend()
+        with patch.object(main.weather_service, "geocode_cache", geocode), \
+                patch.object(main.weather_service, "weather_cache", weather):
+            with TestClient(main.app):
+                assert geocode.get("london") == [51.5074, -0.1278]
+                weather.set("48.8566,2.3522", {"temperature": 9.0}, 600)
+
+        fresh = {"geocode": InProcessCacheBackend(), "weather": InProcessCacheBackend()}
+        CacheSnapshotter(path, fresh).restore()
+        assert fresh["weather"].get("48.8566,2.3522") == {"temperature": 9.0}
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the memory-bounded cache store
+"""
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.cache import InProcessCacheBackend
+from src.main import app
+from src.store import CacheEntry, FrequencySketch, TinyLFUStore, pack_value, unpack_value
+
+RECORD = {
+    "temperature": 15.2,
+    "windspeed": 10.5,
+    "winddirection": 270.0,
+    "weathercode": 3,
+    "is_day": 1,
+    "time": "2024-01-01T12:00",
+}
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the FastAPI app"""
+    with TestClient(app) as client:
+        yield client
+
+
+class TestPacking:
+    """Test cases for compact value encoding"""
+
+    def test_coordinates_packed_as_struct(self):
+        data = pack_value([51.5074, -0.1278])
+        assert len(data) == 17
+        assert unpack_value(data) == [51.5074, -0.1278]
+
+    def test_record_packed_as_struct(self):
+        data = pack_value(RECORD)
+        assert data[:1] == b"w"
+        assert len(data) < len(str(RECORD))
+        assert unpack_value(data) == RECORD
+
+    def test_partial_record_keeps_only_present_fields(self):
+        assert unpack_value(pack_value({"temperature": 0.0})) == {"temperature": 0.0}
+
+    def test_other_values_fall_back_to_json(self):
+        value = {"temperature": 1.0, "humidity": 80}
+        assert pack_value(value)[:1] == b"j"
+        assert unpack_value(pack_value(value)) == value
+
+    def test_entries_use_slots(self):
+        entry = CacheEntry("london", b"x", 0.0)
+        assert not hasattr(entry, "__dict__")
+
+
+class TestFrequencySketch:
+    """Test cases for the access-frequency sketch"""
+
+    def test_rows_spread_keys_independently(self):
+        sketch = FrequencySketch(4096)
+        indexes = [sketch._indexes(f"city-{i}") for i in range(1000)]
+        for row in range(sketch.depth):
+            assert len({key_indexes[row] for key_indexes in indexes}) > 800
+        # Keys that share a counter in one row almost never share one in another
+        pairs = {(key_indexes[0], key_indexes[1]) for key_indexes in indexes}
+        assert len(pairs) >= 995
+
+
+class TestTinyLFUStore:
+    """Test cases for byte-budgeted W-TinyLFU eviction"""
+
+    def test_stays_within_byte_budget(self):
+        store = TinyLFUStore(max_bytes=20_000)
+        for i in range(1000):
+            store.put(f"city-{i}", [float(i), float(i)], time.time() + 60)
+        assert store.bytes_used <= 20_000
+        assert store.evictions > 0
+        assert len(store) < 1000
+
+    def test_popular_keys_survive_a_scan(self):
+        store = TinyLFUStore(max_bytes=40_000)
+        now = time.time()
+        hot = [f"hot-{i}" for i in range(50)]
+        for key in hot:
+            store.put(key, [1.0, 2.0], now + 600)
+        for _ in range(5):
+            for key in hot:
+                store.get(key, now)
+
+        # Attacker enumerates thousands of one-off names
+        for i in range(5000):
+            key = f"scan-{i}"
+            if store.get(key, now) is None:
+                store.put(key, [1.0, 2.0], now + 600)
+
+        surviving = sum(store.get(key, now) is not None for key in hot)
+        assert surviving >= 45
+        assert store.bytes_used <= 40_000
+
+    def test_expired_entries_are_removed_on_read(self):
+        store = TinyLFUStore(max_bytes=10_000)
+        store.put("london", [1.0, 2.0], time.time() - 1)
+        assert store.get("london", time.time()) is None
+        assert len(store) == 0
+        assert store.stats()["expirations"] == 1
+
+    def test_replacing_key_keeps_accounting_correct(self):
+        store = TinyLFUStore(max_bytes=10_000)
+        store.put("london", [1.0, 2.0], time.time() + 60)
+        used = store.bytes_used
+        store.put("london", [3.0, 4.0], time.time() + 60)
+        assert store.bytes_used == used
+        assert store.get("london", time.time()) == [3.0, 4.0]
+
+    def test_peek_does_not_count_as_access(self):
+        store = TinyLFUStore(max_bytes=10_000)
+        store.put("london", [1.0, 2.0], time.time() + 60)
+        assert store.peek("london", time.time()) == [1.0, 2.0]
+        assert store.peek("paris", time.time()) is None
+        assert store.peek("london", time.time() + 120) is None
+        assert (store.hits, store.misses) == (0, 0)
+        assert store.sketch.estimate("london") == 0
+
+    def test_stats_report_memory_and_evictions(self):
+        store = TinyLFUStore(max_bytes=5_000)
+        for i in range(200):
+            store.put(f"city-{i}", [1.0, 2.0], time.time() + 60)
+        stats = store.stats()
+        assert stats["bytes_used"] <= stats["max_bytes"] == 5_000
+        assert stats["evictions_per_second"] > 0
+
+
+class TestCacheStatsEndpoint:
+    """Test cases for /cache/stats"""
+
+    def test_reports_both_caches(self, client):
+        response = client.get("/cache/stats")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["geocode"]["max_bytes"] > 0
+        assert "evictions_per_second" in data["weather"]
+
+    def test_backend_budget_is_configurable(self):
+        cache = InProcessCacheBackend(max_bytes=4_000)
+        for i in range(500):
+            cache.set(f"city-{i}", [1.0, 2.0], 60)
+        assert cache.stats()["bytes_used"] <= 4_000
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the queue-based logging pipeline
+"""
+import io
+import json
+import logging
+import queue
+
+import pytest
+
+from src.structured_logging import (
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    RateLimitFilter,
+    UVICORN_LOGGERS,
+    TextFormatter,
+    configure_logging,
+)
+
+
+def make_record(msg, *args, level=logging.INFO, **extra):
+    record = logging.LogRecord("src.main", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def restore_root_logger():
+    """Put the root and uvicorn loggers back the way pytest configured them"""
+    loggers = [logging.getLogger()] + [logging.getLogger(name) for name in UVICORN_LOGGERS]
+    saved = [(logger, list(logger.handlers), logger.level, logger.propagate) for logger in loggers]
+    yield
+    for logger, handlers, level, propagate in saved:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        for handler in handlers:
+            logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = propagate
+
+
+class TestJsonFormatter:
+    """Test cases for structured JSON output"""
+
+    def test_formats_message_lazily_as_json(self):
+        record = make_record("Found coordinates for %s: %s, %s", "London", 51.5, -0.1)
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry["message"] == "Found coordinates for London: 51.5, -0.1"
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "src.main"
+
+    def test_includes_extra_fields(self):
+        record = make_record("lookup", city="London", cache_hit=True)
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry["city"] == "London"
+        assert entry["cache_hit"] is True
+
+
+class TestTextFormatter:
+    """Test cases for plain text output"""
+
+    def test_plain_line(self):
+        record = make_record("Found coordinates for %s", "London")
+        assert TextFormatter().format(record) == "INFO:src.main:Found coordinates for London"
+
+    def test_reports_suppressed_count(self):
+        record = make_record("Found coordinates for %s", "London", suppressed=4)
+        assert TextFormatter().format(record).endswith("London (4 similar lines suppressed)")
+
+
+class TestRateLimitFilter:
+    """Test cases for per-message-type rate limiting"""
+
+    def test_limits_each_template_separately(self):
+        limiter = RateLimitFilter(rate=3)
+        hot = [limiter.filter(make_record("Found %s", i)) for i in range(10)]
+        other = limiter.filter(make_record("Other %s", 1))
+        assert sum(hot) == 3
+        assert other
+
+    def test_warnings_are_never_limited(self):
+        limiter = RateLimitFilter(rate=1)
+        passed = [
+            limiter.filter(make_record("Upstream failed", level=logging.ERROR))
+            for _ in range(10)
+        ]
+        assert all(passed)
+
+    def test_reports_suppressed_count(self, monkeypatch):
+        clock = [0.0]
+        monkeypatch.setattr("src.structured_logging.time.monotonic", lambda: clock[0])
+        limiter = RateLimitFilter(rate=1)
+        for _ in range(5):
+            limiter.filter(make_record("Found %s", 1))
+        clock[0] = 1.0
+        record = make_record("Found %s", 1)
+        assert limiter.filter(record)
+        assert record.suppressed == 4
+
+    def test_rate_below_one_per_second_lets_lines_through(self, monkeypatch):
+        clock = [0.0]
+        monkeypatch.setattr("src.structured_logging.time.monotonic", lambda: clock[0])
+        limiter = RateLimitFilter(rate=0.5)
+        passed = []
+        for _ in range(6):
+            passed.append(limiter.filter(make_record("Found %s", 1)))
+            clock[0] += 1.0
+        assert passed == [True, False, True, False, True, False]
+
+    def test_override_disables_limit_for_template(self):
+        limiter = RateLimitFilter(rate=1, overrides={"Audit %s": 0})
+        assert all(limiter.filter(make_record("Audit %s", i)) for i in range(10))
+
+
+class TestNonBlockingQueueHandler:
+    """Test cases for the hot-path queue handler"""
+
+    def test_does_not_format_on_caller_thread(self):
+        handler = NonBlockingQueueHandler(queue.Queue())
+        record = make_record("Found %s", "London")
+        handler.emit(record)
+        queued = handler.queue.get_nowait()
+        assert queued.msg == "Found %s"
+        assert queued.args == ("London",)
+
+    def test_drops_when_queue_full(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        handler.emit(make_record("first"))
+        handler.emit(make_record("second"))
+        assert handler.dropped == 1
+
+
+class TestConfigureLogging:
+    """Test cases for installing the pipeline"""
+
+    def test_writes_json_from_background_thread(self, restore_root_logger):
+        stream = io.StringIO()
+        listener = configure_logging(
+            level="INFO", json_output=True, sample_rate=0, stream=stream, force=True
+        )
+        logging.getLogger("src.main").info("Found coordinates for %s", "London")
+        listener.queue.join()
+
+        entry = json.loads(stream.getvalue().strip())
+        assert entry["message"] == "Found coordinates for London"
+
+    def test_routes_uvicorn_access_log_through_queue(self, restore_root_logger):
+        access = logging.getLogger("uvicorn.access")
+        access.addHandler(logging.StreamHandler(io.StringIO()))
+        access.propagate = False
+        stream = io.StringIO()
+        listener = configure_logging(
+            level="INFO", json_output=True, sample_rate=0, stream=stream, force=True
+        )
+        access.info('%s - "%s %s HTTP/%s" %d', "127.0.0.1", "GET", "/health", "1.1", 200)
+        listener.queue.join()
+
+        assert access.handlers == [] and access.propagate
+        assert json.loads(stream.getvalue().strip())["logger"] == "uvicorn.access"
+
+    def test_keeps_existing_handlers_without_force(self, restore_root_logger):
+        logging.getLogger().addHandler(logging.NullHandler())
+        assert configure_logging() is None